@@ -24,6 +24,11 @@ from sugar.graphics.toolbutton import ToolButton
 from sugar.activity import activity
 from gettext import gettext as _
 import gtk
+import gobject
+import os
+import time
+import tempfile
+import threading
 
 
 try:
@@ -35,6 +40,9 @@ except ImportError:
     # <= 0.84 toolbars
     pass
 
+# Seconds get_preview waits for a preview of the current scene at most
+PREVIEW_WAIT = 5.0
+
 
 class PhysicsActivity(olpcgames.PyGameActivity):
     game_name = 'physics'
@@ -42,6 +50,16 @@ class PhysicsActivity(olpcgames.PyGameActivity):
     game_size = None # Olpcgame will choose size
 
     def __init__(self, handle):
+        # (world version, PNG data) of the last finished preview, set by
+        # the game's preview thread (see set_preview)
+        self._preview = None
+        self._preview_ready = threading.Event()
+        # The running background save (see save) and what waits for it
+        self._save_request = None
+        self._saved_file = None
+        self._save_again = False
+        self._close_pending = False
+        self._closing = False
         super(PhysicsActivity, self).__init__(handle)
         self.metadata['mime_type'] = 'application/x-physics-activity'
         self.add_events(gtk.gdk.ALL_EVENTS_MASK |
@@ -52,27 +70,119 @@ class PhysicsActivity(olpcgames.PyGameActivity):
     def get_preview(self):
         """Custom preview code to get image from pygame.
         """
-        surface = pygame.display.get_surface()
-        width, height = surface.get_width(), surface.get_height()
-        pixbuf = gtk.gdk.pixbuf_new_from_data(pygame.image.tostring(surface,
-                                                                    "RGB"),
-                                              gtk.gdk.COLORSPACE_RGB, 0, 8,
-                                              width, height,
-                                              3 * width)
-        pixbuf = pixbuf.scale_simple(300, 225, gtk.gdk.INTERP_BILINEAR)
+        # The last preview is used while the scene is unchanged. Otherwise
+        # the pygame thread scales the screen down and a worker thread
+        # encodes it, which takes a frame and the encoding.
+        game = getattr(self, 'game', None)
+        preview = self._preview
+        if game is not None:
+            version = game.world.version
+            if preview is None or preview[0] < version:
+                olpcgames.eventwrap.post(olpcgames.eventwrap.Event(
+                    type = pygame.USEREVENT,
+                    action = "preview"))
+                deadline = time.time() + PREVIEW_WAIT
+                while preview is None or preview[0] < version:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._preview_ready.wait(remaining)
+                    self._preview_ready.clear()
+                    preview = self._preview
+        if preview is None:
+            return None
+        return preview[1]
+
+    def set_preview(self, version, data):
+        """Called by the game's preview thread with a finished preview of
+        the scene at world version version.
+        """
+        self._preview = (version, data)
+        self._preview_ready.set()
+
+    def save(self):
+        """Save in the background: the game captures the scene and a worker
+        writes it to a file in the instance directory, then the usual Sugar
+        save is done with that file (see write_file). A save or close asked
+        for meanwhile waits for it.
+        """
+        if self._closing:
+            # The activity goes away, so there is nothing to keep alive
+            super(PhysicsActivity, self).save()
+            return
+        if self._save_request is not None:
+            self._save_again = True
+            return
+        fd, path = tempfile.mkstemp(prefix='save-',
+                                    dir=os.path.join(self.get_activity_root(),
+                                                     'instance'))
+        os.close(fd)
+        event = olpcgames.eventwrap.Event(
+            type = pygame.USEREVENT,
+            code = olpcgames.FILE_WRITE_REQUEST,
+            filename = path,
+            metadata = self.metadata)
+        olpcgames.eventwrap.post(event)
+        self._save_request = event
+        gobject.timeout_add(50, self._save_poll)
 
-        preview_data = []
-        def save_func(buf, data):
-            data.append(buf)
+    def _save_poll(self):
+        """Finish the background save once its file is written"""
+        request = self._save_request
+        if request is None:
+            # Forgotten by a forced close
+            return False
+        job = getattr(request, 'job', None)
+        if job is None or job.isAlive():
+            return True
+        self._save_request = None
+        if job.crc is not None:
+            self._saved_file = request.filename
+        else:
+            # The writer failed, write_file saves the usual way instead
+            os.remove(request.filename)
+        try:
+            super(PhysicsActivity, self).save()
+        finally:
+            if self._saved_file is not None:
+                os.remove(self._saved_file)
+                self._saved_file = None
+        if self._save_again:
+            self._save_again = False
+            self.save()
+        elif self._close_pending:
+            self._close_pending = False
+            self.close()
+        return False
 
-        pixbuf.save_to_callback(save_func, 'png', user_data=preview_data)
-        preview_data = ''.join(preview_data)
+    def can_close(self):
+        if self._save_request is not None:
+            # Closed when the running save is done (see _save_poll)
+            self._close_pending = True
+            return False
+        return super(PhysicsActivity, self).can_close()
 
-        return preview_data
+    def close(self, *args, **kwargs):
+        # Closing saves one last time and must wait for the file
+        self._closing = True
+        try:
+            super(PhysicsActivity, self).close(*args, **kwargs)
+        finally:
+            self._closing = False
+        if self._close_pending:
+            # Postponed by can_close
+            return
+        # Saved synchronously, the background save isn't needed any more
+        self._save_request = None
 
     def write_file(self, file_path):
         """Over-ride olpcgames write_file so that title keeps working.
         """
+        if self._saved_file is not None:
+            # Written in the background already (see save)
+            os.rename(self._saved_file, file_path)
+            self._saved_file = None
+            return
         event = olpcgames.eventwrap.Event(
             type = pygame.USEREVENT,
             code = olpcgames.FILE_WRITE_REQUEST,
@@ -80,6 +190,11 @@ class PhysicsActivity(olpcgames.PyGameActivity):
             metadata = self.metadata)
         olpcgames.eventwrap.post(event)
         event.block()
+        # Only used while closing and after a failed background save (see
+        # save), the file is needed now
+        job = getattr(event, 'job', None)
+        if job is not None:
+            job.join()
         event.retire() # <- Without this, title editing stops updating
 
     # Setup the toolbar
@@ -140,6 +255,35 @@ class PhysicsActivity(olpcgames.PyGameActivity):
         create_toolbar.insert(self.stop_play, -1)
         self.stop_play.show()
 
+        # Undo/redo buttons
+        undo = ToolButton('edit-undo')
+        undo.set_tooltip(_("Undo"))
+        undo.set_accelerator(_('<ctrl>z'))
+        undo.connect('clicked', self.undo_cb)
+        create_toolbar.insert(undo, -1)
+        undo.show()
+
+        redo = ToolButton('edit-redo')
+        redo.set_tooltip(_("Redo"))
+        redo.set_accelerator(_('<ctrl>y'))
+        redo.connect('clicked', self.redo_cb)
+        create_toolbar.insert(redo, -1)
+        redo.show()
+
+        # Timeline to rewind the simulation, the right end is now
+        self.timeline = gtk.HScale(gtk.Adjustment(1.0, 0.0, 1.0, 0.01, 0.1))
+        self.timeline.set_draw_value(False)
+        self.timeline.set_update_policy(gtk.UPDATE_DELAYED)
+        self.timeline.set_size_request(150, -1)
+        self.timeline.connect('value-changed', self.timeline_cb)
+        item = gtk.ToolItem()
+        item.add(self.timeline)
+        create_toolbar.insert(item, -1)
+        self.timeline.show()
+        item.show()
+        self._timeline_following = False
+        gobject.timeout_add(200, self._follow_timeline)
+
         separator = gtk.SeparatorToolItem()
         create_toolbar.insert(separator, -1)
         separator.show()
@@ -173,6 +317,35 @@ class PhysicsActivity(olpcgames.PyGameActivity):
             self.stop_play.set_icon('media-playback-start')
             self.stop_play.set_tooltip(_("Start"))
 
+    def undo_cb(self, button):
+        pygame.event.post(olpcgames.eventwrap.Event(pygame.USEREVENT,
+                                                    action="undo"))
+
+    def redo_cb(self, button):
+        pygame.event.post(olpcgames.eventwrap.Event(pygame.USEREVENT,
+                                                    action="redo"))
+
+    def timeline_cb(self, scale):
+        if self._timeline_following:
+            # Moved by _follow_timeline, not by the user
+            return
+        pygame.event.post(olpcgames.eventwrap.Event(pygame.USEREVENT,
+                                                    action="seek",
+                                                    position=scale.get_value()))
+
+    def _follow_timeline(self):
+        """Move the timeline to where the simulation is, unless the user
+        is dragging it.
+        """
+        game = getattr(self, 'game', None)
+        if game is not None and gtk.grab_get_current() is not self.timeline:
+            position = game.timeline_position
+            if abs(position - self.timeline.get_value()) > 0.001:
+                self._timeline_following = True
+                self.timeline.set_value(position)
+                self._timeline_following = False
+        return True
+
     def radioClicked(self, button):
         pygame.event.post(olpcgames.eventwrap.Event(pygame.USEREVENT,
                                                  action=self.radioList[button]))
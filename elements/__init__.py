@@ -0,0 +1,2 @@
+__all__ = ['locals', 'menu']
+from elements import Elements
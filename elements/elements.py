@@ -0,0 +1,996 @@
+#!/usr/bin/python
+"""
+This file is part of the 'Elements' Project
+Elements is a 2D Physics API for Python (supporting pybox2d)
+
+Copyright (C) 2008, The Elements Team, <elements@linuxuser.at>
+
+Home:  http://elements.linuxuser.at
+IRC:   #elements on irc.freenode.org
+
+Code:  http://www.assembla.com/wiki/show/elements
+       svn co http://svn2.assembla.com/svn/elements                     
+
+License:  GPLv3 | See LICENSE for the full text
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.              
+"""
+__version__=  '0.11'
+__contact__ = '<elements@linuxuser.at>'
+
+# Load Box2D
+try:
+    import Box2D as box2d
+except:
+    print 'Could not load the pybox2d library (Box2D).'
+    print 'Please run "setup.py install" to install the dependencies.'
+    print 
+    print 'Alternatively, recompile pybox2d for your system and python version.'
+    print "See http://code.google.com/p/pybox2d"
+    exit()
+
+# Standard Imports
+from random import shuffle
+
+# Load Elements Definitions
+from locals import *
+
+# Load Elements Modules
+import tools
+import drawing
+import add_objects
+import callbacks
+import camera
+import scenefile
+import oplog
+import history
+import timeline
+
+# Main Class
+class Elements:
+    """The class which handles all interaction with the box2d engine
+    """
+    # Settings
+    run_physics   =True           # Can pause the simulation
+    element_count =0              # Element Count 
+    renderer      =None           # Drawing class (from drawing.py)
+    input         =INPUT_PIXELS   # Default Input in Pixels! (can change to INPUT_METERS)
+    line_width    =0              # Line Width in Pixels (0 for fill)
+    listener      =None
+    
+    screen_offset = (0, 0)        # Offset screen from world coordinate system (x, y) [meter5]
+    screen_offset_pixel = (0, 0)  # Offset screen from world coordinate system (x, y) [pixel]
+    
+    # The internal coordination system is y+=up, x+=right
+    # But it's possible to change the input coords to something else,
+    # they will then be translated on input
+    inputAxis_x_left = False    # positive to the right by default
+    inputAxis_y_down = True     # positive to up by default
+
+    mouseJoint = None
+    oplog = None                # Write-ahead log of edits (see oplog.py)
+    history = None              # Undo and redo (see history.py)
+    timeline = None             # Checkpoints to rewind to (see timeline.py)
+    version = 0                 # Changes with every step and every edit
+    loader = None               # Scene being loaded (see binary_loader)
+
+    def __init__(self, screen_size, gravity=(0.0,-9.0), ppm=100.0, renderer='pygame'):
+        """ Init the world with boundaries and gravity, and init colors.
+        
+            Parameters:
+              screen_size .. (w, h) -- screen size in pixels [int]
+              gravity ...... (x, y) in m/s^2  [float] default: (0.0, -9.0)
+              ppm .......... pixels per meter [float] default: 100.0
+              renderer ..... which drawing method to use (str) default: 'pygame'
+
+            Return: class Elements()
+        """
+        self.set_screenSize(screen_size)
+        self.set_drawingMethod(renderer)
+        
+        # Create Subclasses
+        self.add = add_objects.Add(self)
+        self.callbacks = callbacks.CallbackHandler(self)
+        self.camera = camera.Camera(self)
+        
+        # Set Boundaries
+        self.worldAABB=box2d.b2AABB()
+        self.worldAABB.lowerBound = (-100.0, -100.0)
+        self.worldAABB.upperBound = (100.0, 100.0)
+        
+        # Gravity + Bodies will sleep on outside
+        self.gravity = gravity
+        self.doSleep = True
+    
+        # Create the World
+        self.world = box2d.b2World(self.worldAABB, self.gravity, self.doSleep)
+
+        # Registry of all bodies and joints by their id (see register_body)
+        self.bodies = {}
+        self.joints = {}
+        self._next_id = 1
+
+        # Init Colors        
+        self.init_colors()
+        
+        # Set Pixels per Meter
+        self.ppm = ppm
+
+    def register_body(self, body, id=None):
+        """ Give a body a stable id and add it to the registry. The id is
+            stored in the body's userData, so it survives saving and loading.
+            Id 0 is reserved for the Box2D ground body.
+
+            Parameters:
+              body ... box2d.b2Body with a dict as userData
+              id ..... id to use (eg. when loading), default: next free id
+
+            Return: id
+        """
+        if id is None:
+            id = self._next_id
+        elif id in self.bodies:
+            raise ValueError("Body id %d is taken" % id)
+        self._next_id = max(self._next_id, id + 1)
+        body.userData['id'] = id
+        self.bodies[id] = body
+        self.version += 1
+        if self.oplog is not None:
+            self.oplog.add_body(id)
+        if self.history is not None:
+            self.history.add_body(id)
+        return id
+
+    def register_joint(self, joint, id=None):
+        """ Give a joint a stable id and add it to the registry (see register_body)
+
+            Return: id
+        """
+        if id is None:
+            id = self._next_id
+        elif id in self.joints:
+            raise ValueError("Joint id %d is taken" % id)
+        self._next_id = max(self._next_id, id + 1)
+        userData = joint.userData
+        if type(userData) != type({}):
+            userData = {}
+        userData['id'] = id
+        joint.userData = userData
+        self.joints[id] = joint
+        self.version += 1
+        if self.oplog is not None:
+            self.oplog.add_joint(id)
+        if self.history is not None:
+            self.history.add_joint(id)
+        return id
+
+    def get_id(self, item):
+        """ Get the id of a body or joint
+
+            Return: id, 0 for the ground body or None if the item isn't registered
+        """
+        userData = item.userData
+        if type(userData) == type({}) and userData.has_key('id'):
+            return userData['id']
+        if item == self.world.GetGroundBody():
+            return 0
+        return None
+
+    def get_body(self, id):
+        """ Return: the body with the given id, or None
+        """
+        if id == 0:
+            return self.world.GetGroundBody()
+        return self.bodies.get(id)
+
+    def get_joint(self, id):
+        """ Return: the joint with the given id, or None
+        """
+        return self.joints.get(id)
+
+    def destroy_joint(self, joint):
+        """ Remove a joint from the world and the registry
+        """
+        if self.history is not None:
+            self.history.remove_joint(joint)
+        id = self.get_id(joint)
+        self.joints.pop(id, None)
+        self.version += 1
+        if self.oplog is not None and id is not None:
+            self.oplog.remove_joint(id)
+        self.world.DestroyJoint(joint)
+
+    def destroy_body(self, body):
+        """ Remove a body from the world and the registry. Box2D removes
+            all joints attached to it as well.
+        """
+        if self.history is not None:
+            self.history.remove_body(body)
+        jointnode = body.GetJointList()
+        while jointnode:
+            id = self.get_id(jointnode.joint)
+            if id is not None:
+                # May be unregistered already, eg. in a batch destroy
+                self.joints.pop(id, None)
+            jointnode = jointnode.next
+
+        if self.mouseJoint and self.get_id(self.mouseJoint.GetBody2()) == self.get_id(body):
+            self.add.remove_mouseJoint()
+
+        id = self.get_id(body)
+        self.bodies.pop(id, None)
+        self.version += 1
+        if self.oplog is not None and id is not None:
+            self.oplog.remove_body(id)
+        self.world.DestroyBody(body)
+
+    def reset(self):
+        """ Remove all bodies and joints at once by swapping in a new, empty
+            Box2D world with the same settings, and empty the registries.
+            Bodies and joints of the old world must not be used any more.
+            The write-ahead log isn't told (see clear).
+        """
+        if self.loader is not None:
+            self.loader.cancel()
+        self.mouseJoint = None
+        self.world = box2d.b2World(self.worldAABB, self.gravity, self.doSleep)
+        if self.listener is not None:
+            self.world.SetContactListener(self.listener)
+        self.bodies = {}
+        self.joints = {}
+        self._next_id = 1
+        self.element_count = 0
+        self.version += 1
+        if self.history is not None:
+            self.history.clear()
+        if self.timeline is not None:
+            self.timeline.clear()
+
+    def clear(self):
+        """ Start a new, empty scene (see reset)
+        """
+        self.reset()
+        if self.oplog is not None:
+            self.oplog.compact()
+
+    def touch(self, body):
+        """ Tell the log and the undo history (if any) that a body is about
+            to be changed by hand, eg. moved, frozen or given another density.
+            Call it before changing the body.
+        """
+        id = self.get_id(body)
+        self.version += 1
+        if self.oplog is not None and id:
+            self.oplog.change_body(id)
+        if self.history is not None and id:
+            self.history.change_body(body)
+
+    def set_oplog(self, path):
+        """ Record all edits in a write-ahead log (see oplog.py), so the
+            world can be recovered after a crash. Call oplog.commit() once
+            per frame.
+
+            Parameters:
+              path ... base path of the snapshot and log files, None to stop
+
+            Return: oplog.OpLog or None
+        """
+        if self.oplog is not None:
+            self.oplog.close()
+        if path is None:
+            self.oplog = None
+        else:
+            self.oplog = oplog.OpLog(self, path)
+        return self.oplog
+
+    def set_history(self, max_bytes):
+        """ Keep an undo history (see history.py). Call history.commit()
+            after each edit, eg. when the mouse button is released.
+
+            Parameters:
+              max_bytes ... memory to use for the history, None to stop
+
+            Return: history.History or None
+        """
+        if max_bytes is None:
+            self.history = None
+        else:
+            self.history = history.History(self, max_bytes)
+        return self.history
+
+    def set_timeline(self, slots, interval=30, before_step=None):
+        """ Keep checkpoints of the simulation to rewind to (see timeline.py)
+
+            Parameters:
+              slots ......... number of checkpoints, None to stop
+              interval ...... simulation steps between two checkpoints
+              before_step ... function to call before every step that is
+                              simulated again, or None
+
+            Return: timeline.Timeline or None
+        """
+        if slots is None:
+            self.timeline = None
+        else:
+            self.timeline = timeline.Timeline(self, slots, interval,
+                                              before_step=before_step)
+        return self.timeline
+
+    def set_inputUnit(self, input):
+        """ Change the input unit to either meter or pixels
+        
+            Parameters:
+              input ... INPUT_METERS or INPUT_PIXELS
+          
+            Return: -
+        """
+        self.input = input
+        
+    def set_inputAxisOrigin(self, left=True, top=False):
+        """ Change the origin of the input coordinate system axis
+        
+            Parameters:
+              left ... True or False -- x = 0 is at the left?
+              top .... True or False -- y = 0 is at the top?
+          
+            Return: -
+        """          
+        self.inputAxis_x_left = not left
+        self.inputAxis_y_down = top
+
+    def set_drawingMethod(self, m, *kw):
+        """ Set a drawing method (from drawing.py)
+        
+            Parameters:
+              m .... 'pygame' or 'cairo'
+              *kw .. keywords to pass to the initializer of the drawing method
+
+            Return: True if ok, False if no method identifier m found
+        """
+        try:
+            self.renderer = getattr(drawing, "draw_%s" % m) (*kw)
+            return True
+        except AttributeError:
+            return False
+            
+    def set_screenSize(self, size):
+        """ Set the current screen size
+        
+            Parameters: 
+              size ... (int(width), int(height)) in pixels
+              
+            Return: -
+        """
+        self.display_width, self.display_height = size
+
+    def init_colors(self):
+        """ Init self.colors with a fix set of hex colors
+        
+            Return: -        
+        """
+        self.fixed_color = None
+        self.cur_color = 0
+        self.colors = [
+          "#737934", "#729a55", "#040404", "#1d4e29", "#ae5004", "#615c57",
+          "#6795ce", "#203d61", "#8f932b"
+        ]
+        shuffle(self.colors)
+
+    def set_color(self, clr):
+        """ Set a fixed color for all future Elements (until reset_color() is called) 
+        
+            Parameters: 
+              clr ... Hex '#123123' or RGB ((r), (g), (b))
+              
+            Return: -
+        """
+        self.fixed_color = clr
+    
+    def reset_color(self):
+        """ All Elements from now on will be drawn in random colors
+           
+            Return: - 
+        """
+        self.fixed_color = None
+
+    def get_color(self):
+        """ Get a color - either the fixed one or the next from self.colors 
+        
+            Return: clr = ((R), (G), (B)) 
+        """
+        if self.fixed_color != None:
+            return self.fixed_color
+            
+        if self.cur_color == len(self.colors): 
+            self.cur_color = 0
+            shuffle(self.colors)
+    
+        clr = self.colors[self.cur_color]
+        if clr[0] == "#":
+            clr = tools.hex2rgb(clr)
+        
+        self.cur_color += 1
+        return clr
+    
+    def update(self, fps=50.0, vel_iterations=10, pos_iterations=8):
+        """ Update the physics, if not paused (self.run_physics)
+        
+            Parameters:
+              fps ............. fps with which the physics engine shall work
+              vel_iterations .. velocity substeps per step for smoother simulation
+              pos_iterations .. position substeps per step for smoother simulation
+            
+            Return: -
+        """
+        if self.run_physics:
+            self.world.Step(1.0 / fps, vel_iterations, pos_iterations)
+            self.version += 1
+            if self.timeline is not None:
+                self.timeline.record(fps, vel_iterations, pos_iterations)
+
+    def translate_coord(self, point):
+        """ Flips the coordinates in another coordinate system orientation, if necessary
+            (screen <> world coordinate system) 
+        """
+        x, y = point
+
+        if self.inputAxis_x_left:
+            x = self.display_width - x
+
+        if self.inputAxis_y_down:
+            y = self.display_height - y
+            
+        return (x, y)
+        
+    def translate_coords(self, pointlist):
+        """ Flips the coordinates in another coordinate system orientation, if necessary 
+            (screen <> world coordinate system) 
+        """    
+        p_out = []        
+        for p in pointlist:
+            p_out.append(self.translate_coord(p))
+        return p_out
+
+    def to_world(self, pos):
+        """ Transfers a coordinate from the screen to the world coordinate system (pixels)
+            - Change to the right axis orientation
+            - Include the offset: screen -- world coordinate system
+            - Include the scale factor (Screen coordinate system might have a scale factor)
+        """
+        dx, dy = self.screen_offset_pixel
+        
+        x = pos[0] / self.camera.scale_factor
+        y = pos[1] / self.camera.scale_factor
+        
+        x, y = self.translate_coord((round(x), round(y)))
+        return (x+dx, y+dy) 
+        
+    def to_screen(self, pos):
+        """ Transfers a coordinate from the world to the screen coordinate system (pixels)
+            and by the screen offset
+        """
+        dx, dy = self.screen_offset_pixel
+        x = pos[0] - dx
+        y = pos[1] - dy
+        
+        sx, sy = self.translate_coord((x, y))
+        return (sx * self.camera.scale_factor, sy * self.camera.scale_factor)
+                         
+    def meter_to_screen(self, i):
+        return i * self.ppm * self.camera.scale_factor
+        
+    def get_bodies_at_pos(self, search_point, include_static=False, area=0.01):
+        """ Check if given point (screen coordinates) is inside any body.
+            If yes, return all found bodies, if not found return False
+        """
+        sx, sy = self.to_world(search_point)
+        sx /= self.ppm
+        sy /= self.ppm
+
+        f = area/self.camera.scale_factor
+
+        AABB=box2d.b2AABB()
+        AABB.lowerBound = (sx-f, sy-f)
+        AABB.upperBound = (sx+f, sy+f)
+
+        amount, shapes = self.world.Query(AABB, 2)
+
+        if amount == 0:
+            return False
+        else:
+            bodylist = []
+            for s in shapes:
+                body = s.GetBody()
+                if not include_static:
+                    if body.IsStatic() or body.GetMass() == 0.0:
+                        continue
+                        
+                if s.TestPoint(body.GetXForm(), (sx, sy)):
+                    bodylist.append(body)
+
+            return bodylist
+    
+    def to_meters(self, pos):
+        """ Transfers a coordinate from the screen to the world coordinate system (meters)
+        """
+        x, y = self.to_world(pos)
+        return (x / self.ppm, y / self.ppm)
+
+    def from_meters(self, pos):
+        """ Transfers a coordinate from the world (meters) to the screen coordinate system
+        """
+        return self.to_screen((pos[0] * self.ppm, pos[1] * self.ppm))
+
+    def _screen_normal(self, normal):
+        # Normals are directions, so only flip the axes
+        x, y = normal
+        if self.inputAxis_x_left:
+            x = -x
+        if self.inputAxis_y_down:
+            y = -y
+        return (x, y)
+
+    def _segment(self, p1, p2, segment=None):
+        # Build (or refill) a b2Segment from two screen coordinates
+        if segment is None:
+            segment = box2d.b2Segment()
+        segment.p1 = self.to_meters(p1)
+        segment.p2 = self.to_meters(p2)
+        return segment
+
+    def _hit(self, shape, segment, l, normal):
+        # Convert a raycast hit into (body, point, normal) in screen coordinates
+        x1, y1 = segment.p1.tuple()
+        x2, y2 = segment.p2.tuple()
+        point = self.from_meters((x1 + l * (x2 - x1), y1 + l * (y2 - y1)))
+        return (shape.GetBody(), point, self._screen_normal(normal.tuple()))
+
+    def _accept(self, shape, include_static):
+        if include_static:
+            return True
+        body = shape.GetBody()
+        return not (body.IsStatic() or body.GetMass() == 0.0)
+
+    def raycast(self, p1, p2, include_static=True, solid=False):
+        """ Cast a ray from p1 to p2 (screen coordinates) through the Box2D broadphase
+            and return the first body it hits.
+
+            Parameters:
+              p1, p2 ......... start and end of the ray (x, y)
+              include_static . also report static bodies
+              solid .......... count shapes the ray starts in as hits
+
+            Return: (body, point, normal) or None if nothing was hit
+        """
+        segment = self._segment(p1, p2)
+        if include_static:
+            l, normal, shape = self.world.RaycastOne(segment, solid, None)
+            if shape is None:
+                return None
+            return self._hit(shape, segment, l, normal)
+
+        hits = self._raycast_all(segment, include_static, solid, 1)
+        if hits:
+            return hits[0]
+        return None
+
+    def raycast_all(self, p1, p2, include_static=True, solid=False, maxCount=64):
+        """ Cast a ray from p1 to p2 (screen coordinates) through the Box2D broadphase
+            and return every body it hits.
+
+            Parameters:
+              p1, p2 ......... start and end of the ray (x, y)
+              include_static . also report static bodies
+              solid .......... count shapes the ray starts in as hits
+              maxCount ....... maximum number of shapes to report
+
+            Return: [(body, point, normal), ...] ordered along the ray
+              (a body is reported once per hit shape)
+        """
+        return self._raycast_all(self._segment(p1, p2), include_static, solid, maxCount)
+
+    def raycast_batch(self, rays, include_static=True, solid=False, maxCount=64):
+        """ Cast many rays at once, see raycast_all(). A single b2Segment is reused
+            for all of them.
+
+            Parameters:
+              rays ... [(p1, p2), ...] in screen coordinates
+
+            Return: a list with the result of raycast_all() for every ray
+        """
+        results = []
+        segment = box2d.b2Segment()
+        for p1, p2 in rays:
+            self._segment(p1, p2, segment)
+            results.append(self._raycast_all(segment, include_static, solid, maxCount))
+        return results
+
+    def _raycast_all(self, segment, include_static, solid, maxCount):
+        request = maxCount
+        while True:
+            count, shapes = self.world.Raycast(segment, request, solid, None)
+            hits = []
+            for shape in shapes[:count]:
+                if len(hits) == maxCount:
+                    break
+                if not self._accept(shape, include_static):
+                    continue
+
+                hit, l, normal = shape.TestSegment(shape.GetBody().GetXForm(), segment, 1.0)
+                if hit == box2d.e_missCollide:
+                    continue
+                if hit == box2d.e_startsInsideCollide:
+                    l = 0.0
+
+                hits.append(self._hit(shape, segment, l, normal))
+
+            if len(hits) == maxCount or count < request:
+                return hits
+            # Filtered shapes (eg. the static ground) used up some of the
+            # slots, so there may be more hits further along the ray
+            request *= 2
+
+    def draw(self):
+        """ If a drawing method is specified, this function passes the objects
+            to the module in pixels.
+            
+            Return: True if the objects were successfully drawn
+              False if the renderer was not set or another error occurred
+        """
+        self.callbacks.start(CALLBACK_DRAWING_START)
+        
+        # No need to run through the loop if there's no way to draw        
+        if not self.renderer: 
+            return False
+
+        if self.camera.track_body:
+            # Get Body Center
+            p1 = self.camera.track_body.GetWorldCenter()   
+            
+            # Center the Camera There, False = Don't stop the tracking
+            self.camera.center(self.to_screen((p1.x*self.ppm, p1.y*self.ppm)), stopTrack=False) 
+            
+        # Walk through all known elements
+        self.renderer.start_drawing()
+        
+        for body in self.world.bodyList:
+            xform = body.GetXForm()
+            shape = body.GetShapeList()
+            angle = body.GetAngle()
+            
+            if shape:
+                userdata = body.GetUserData()
+                clr = userdata['color']
+                
+            for shape in body.shapeList:                                
+                type = shape.GetType()
+                                
+                if type == box2d.e_circleShape:
+                    position = box2d.b2Mul(xform, shape.GetLocalPosition())
+                    
+                    pos = self.to_screen((position.x*self.ppm, position.y*self.ppm))                    
+                    self.renderer.draw_circle(clr, pos, self.meter_to_screen(shape.radius), angle)
+
+                elif type == box2d.e_polygonShape:
+                    points = []
+                    for v in shape.vertices:
+                        pt = box2d.b2Mul(xform, v)
+                        x, y = self.to_screen((pt.x*self.ppm, pt.y*self.ppm))
+                        points.append([x, y])
+
+                    self.renderer.draw_polygon(clr, points)
+                   
+                else:
+                    print "  unknown shape type:%d" % shape.GetType()
+    
+
+        for joint in self.world.jointList:
+            p2 = joint.GetAnchor1()
+            p2 = self.to_screen((p2.x*self.ppm, p2.y*self.ppm))
+            
+            p1 = joint.GetAnchor2()
+            p1 = self.to_screen((p1.x*self.ppm, p1.y*self.ppm))
+            
+            if p1 == p2:
+                self.renderer.draw_circle((255,255,255), p1, 2, 0)
+            else:
+                self.renderer.draw_lines((0,0,0), False, [p1, p2], 3)
+
+        self.callbacks.start(CALLBACK_DRAWING_END)
+        self.renderer.after_drawing()
+        
+        return True
+
+
+    def mouse_move(self, pos):
+        pos = self.to_world(pos)
+        x, y = pos
+        x /= self.ppm
+        y /= self.ppm
+                        
+        if self.mouseJoint:
+            self.mouseJoint.SetTarget((x,y))
+
+    def pickle_save(self, fn, additional_vars={}):
+        import cPickle as pickle
+        self.add.remove_mouseJoint()
+    
+        if not additional_vars and hasattr(self, '_pickle_vars'):
+            additional_vars=dict((var, getattr(self, var)) for var in self._pickle_vars)
+
+        save_values = [self.world, box2d.pickle_fix(self.world, additional_vars, 'save')]
+
+        try:
+            pickle.dump(save_values, open(fn, 'wb'))
+        except Exception, s:
+            print 'Pickling failed: ', s
+            return
+
+        print 'Saved to %s' % fn
+
+    def pickle_load(self, fn, set_vars=True, additional_vars=[]):
+        """
+        Load the pickled world in file fn.
+        additional_vars is a dictionary to be populated with the
+        loaded variables.
+        """
+        import cPickle as pickle
+        try:
+            world, variables = pickle.load(open(fn, 'rb'))
+            world = world._pickle_finalize()
+            variables  = box2d.pickle_fix(world, variables, 'load')
+        except Exception, s:
+            print 'Error while loading world: ', s
+            return
+        
+        self.world = world
+        
+        if set_vars:
+            # reset the additional saved variables:
+            for var, value in variables.items():
+                if hasattr(self, var):
+                    setattr(self, var, value)
+                else:
+                    print 'Unknown property %s=%s' % (var, value)
+
+        print 'Loaded from %s' % fn
+
+        return variables
+
+    def json_save(self, path, additional_vars = {}):
+        import cjson
+        worldmodel = {}
+
+        bodylist = []
+        for body in self.world.GetBodyList():
+            if not body == self.world.GetGroundBody():
+                shapelist = body.GetShapeList()
+                modelbody = {}
+                modelbody['position'] = body.position.tuple()
+                modelbody['dynamic'] = body.IsDynamic()
+                modelbody['userData'] = body.userData
+                modelbody['angle'] = body.angle
+                modelbody['angularVelocity'] = body.angularVelocity
+                modelbody['linearVelocity'] = body.linearVelocity.tuple()
+                if shapelist and len(shapelist) > 0:
+                    shapes = []
+                    for shape in shapelist:
+                        modelshape = {}
+                        modelshape['density'] = shape.density
+                        modelshape['restitution'] = shape.restitution
+                        modelshape['friction'] = shape.friction
+                        shapename = shape.__class__.__name__
+                        if  shapename == "b2CircleShape":
+                            modelshape['type'] = 'circle'
+                            modelshape['radius'] = shape.radius
+                            modelshape['localPosition'] = shape.localPosition.tuple()
+                        if shapename == "b2PolygonShape":
+                            modelshape['type'] = 'polygon'
+                            modelshape['vertices'] = shape.vertices
+                        shapes.append(modelshape)
+                    modelbody['shapes'] = shapes
+
+                bodylist.append(modelbody)
+
+        worldmodel['bodylist'] = bodylist
+
+        jointlist = []
+
+        for joint in self.world.GetJointList():
+            modeljoint = {}
+
+            if joint.__class__.__name__ == "b2RevoluteJoint":
+                modeljoint['type'] = 'revolute'
+                modeljoint['anchor'] = joint.GetAnchor1().tuple()
+                modeljoint['enableMotor'] = joint.enableMotor
+                modeljoint['motorSpeed'] = joint.motorSpeed
+                modeljoint['maxMotorTorque'] = joint.maxMotorTorque
+            elif joint.__class__.__name__ == "b2DistanceJoint":
+                modeljoint['type'] = 'distance'
+                modeljoint['anchor1'] = joint.GetAnchor1().tuple()
+                modeljoint['anchor2'] = joint.GetAnchor2().tuple()
+
+            modeljoint['body1'] = self.get_id(joint.body1)
+            modeljoint['body2'] = self.get_id(joint.body2)
+            modeljoint['collideConnected'] = joint.collideConnected
+            modeljoint['userData'] = joint.userData
+
+
+            jointlist.append(modeljoint)
+
+        worldmodel['jointlist'] = jointlist
+
+        controllerlist = []
+        worldmodel['controllerlist'] = controllerlist
+
+        worldmodel['additional_vars'] = additional_vars
+
+        f = open(path,'w')
+        f.write(cjson.encode(worldmodel))
+        f.close()
+
+    def json_load(self, path, additional_vars = {}):
+        import cjson
+
+        f = open(path, 'r')
+        worldmodel = cjson.decode(f.read())
+        f.close()
+        self.reset()
+
+        # Loading isn't an edit to log or undo (see oplog.OpLog.recover)
+        log, history = self.oplog, self.history
+        self.oplog = self.history = None
+        try:
+            self._json_load(worldmodel, additional_vars)
+        finally:
+            self.oplog, self.history = log, history
+
+    def _json_load(self, worldmodel, additional_vars):
+
+        # Map the ids used in the file to the new bodies. Files written
+        # before bodies had stable ids use a temporary 'saveid' instead.
+        loaded = {0: self.world.GetGroundBody()}
+
+        #load bodys
+        for body in worldmodel['bodylist']:
+            bodyDef = box2d.b2BodyDef()
+            bodyDef.position = body['position']
+            userData = body['userData']
+            if userData.has_key('saveid'):
+                key = userData.pop('saveid')
+                id = None
+            else:
+                key = id = userData['id']
+            bodyDef.userData = userData
+            bodyDef.angle = body['angle']
+            newBody = self.world.CreateBody(bodyDef)
+            self.register_body(newBody, id)
+            loaded[key] = newBody
+            #_logger.debug(newBody)
+            newBody.angularVelocity = body['angularVelocity']
+            newBody.linearVelocity = body['linearVelocity']
+            if body.has_key('shapes'):
+                for shape in body['shapes']:
+                    if shape['type'] == 'polygon':
+                        polyDef = box2d.b2PolygonDef()
+                        polyDef.setVertices(shape['vertices'])
+                        polyDef.density = shape['density']
+                        polyDef.restitution = shape['restitution']
+                        polyDef.friction = shape['friction']
+                        newBody.CreateShape(polyDef)
+                    if shape['type'] == 'circle':
+                        circleDef = box2d.b2CircleDef()
+                        circleDef.radius = shape['radius']
+                        circleDef.density = shape['density']
+                        circleDef.restitution = shape['restitution']
+                        circleDef.friction = shape['friction']
+                        circleDef.localPosition  = shape['localPosition']
+                        newBody.CreateShape(circleDef)
+                newBody.SetMassFromShapes()
+
+        for joint in worldmodel['jointlist']:
+            if joint['type'] == 'distance':
+                jointDef = box2d.b2DistanceJointDef()
+                body1 = loaded[joint['body1']]
+                anch1 = joint['anchor1']
+                body2 = loaded[joint['body2']]
+                anch2 = joint['anchor2']
+                jointDef.collideConnected = joint['collideConnected']
+                jointDef.Initialize(body1,body2,anch1,anch2)
+                jointDef.SetUserData(joint['userData'])
+                self._load_joint(jointDef, joint['userData'])
+            if joint['type'] == 'revolute':
+                jointDef = box2d.b2RevoluteJointDef()
+                body1 = loaded[joint['body1']]
+                body2 = loaded[joint['body2']]
+                anchor = joint['anchor']
+                jointDef.Initialize(body1,body2,anchor)
+                jointDef.SetUserData(joint['userData'])
+                jointDef.enableMotor = joint['enableMotor']
+                jointDef.motorSpeed = joint['motorSpeed']
+                jointDef.maxMotorTorque = joint['maxMotorTorque']
+                self._load_joint(jointDef, joint['userData'])
+
+        for (k,v) in worldmodel['additional_vars'].items():
+            additional_vars[k] = v
+
+    def binary_save(self, path, additional_vars = {}, background = False):
+        """ Save the world as a binary scene (see scenefile.py), which is
+            much smaller and faster to load than json_save's output.
+
+            Parameters:
+              background ... only capture the world now, pack it and write
+                             the file on a worker thread
+
+            Return: the started scenefile.Writer if background, else None
+        """
+        if self.loader is not None:
+            # Don't save half a scene
+            self.loader.step()
+        captured = scenefile.capture(self, additional_vars)
+        if not background:
+            scenefile.write(path, scenefile.pack(captured))
+            return None
+        writer = scenefile.Writer(path, captured)
+        writer.start()
+        return writer
+
+    def binary_load(self, path, additional_vars = {}):
+        """ Replace the world with the scene from a binary_save file
+        """
+        self.binary_loader(path, additional_vars).step()
+
+    def binary_loader(self, path, additional_vars = {}):
+        """ Start replacing the world with the scene from a binary_save file.
+            The world is cleared right away, the scene is created by calling
+            step(budget) of the returned loader once per frame until it
+            returns True (see scenefile.Loader).
+
+            Return: scenefile.Loader
+        """
+        f = open(path, 'rb')
+        scene = scenefile.Scene(f.read())
+        f.close()
+        self.reset()
+
+        self.loader = scenefile.Loader(self, scene, additional_vars)
+        return self.loader
+
+    def load(self, path, additional_vars = {}, budget = None):
+        """ Load a file written by binary_save or json_save
+
+            Parameters:
+              budget ... seconds per frame to spend on a binary scene,
+                         None to load it all at once
+
+            Return: a scenefile.Loader to step once per frame if the
+                    scene isn't completely loaded yet, else None
+        """
+        f = open(path, 'rb')
+        start = f.read(len(scenefile.MAGIC))
+        f.close()
+        if scenefile.is_scenefile(start):
+            loader = self.binary_loader(path, additional_vars)
+            if not loader.step(budget):
+                return loader
+        else:
+            self.json_load(path, additional_vars)
+        return None
+
+    def _load_joint(self, jointDef, userData):
+        # Create a loaded joint, keeping its saved id if it has one
+        joint = self.world.CreateJoint(jointDef)
+        if type(userData) == type({}) and userData.has_key('id'):
+            self.register_joint(joint, userData['id'])
+        else:
+            self.register_joint(joint)
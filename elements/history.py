@@ -0,0 +1,280 @@
+"""
+This file is part of the 'Elements' Project
+Elements is a 2D Physics API for Python (supporting pybox2d)
+
+Copyright (C) 2008, The Elements Team, <elements@linuxuser.at>
+
+Home:  http://elements.linuxuser.at
+IRC:   #elements on irc.freenode.org
+
+Code:  http://www.assembla.com/wiki/show/elements
+       svn co http://svn2.assembla.com/svn/elements
+
+License:  GPLv3 | See LICENSE for the full text
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Undo and redo of edits
+
+Every step on the undo stack is the list of operations which reverts one
+batch of edits:
+
+  REMOVE_BODIES, REMOVE_JOINTS ... ids of things that were created
+  ADD ............................ a binary scene of things that were destroyed
+  STATE .......................... a binary scene with the state of bodies
+                                   before they were changed
+
+So creating something only costs its ids, and nothing is ever packed but the
+bodies an edit touches. Applying a step returns the step which reverts it,
+which goes onto the other stack.
+"""
+import struct
+
+import scenefile
+
+# Operations
+REMOVE_BODIES = 1
+REMOVE_JOINTS = 2
+ADD = 3
+STATE = 4
+
+# Estimated bytes of bookkeeping per step and operation
+STEP_SIZE = 64
+OP_SIZE = 32
+
+def _ids(ids):
+    # Pack a list of ids
+    return struct.pack('<%dI' % len(ids), *ids)
+
+def _unpack_ids(payload):
+    return struct.unpack('<%dI' % (len(payload) / 4), payload)
+
+def _size(step):
+    size = STEP_SIZE
+    for op, payload in step:
+        size += OP_SIZE + len(payload)
+    return size
+
+class History:
+    """ Undo and redo stacks of an Elements world, limited to max_bytes.
+        Edits are collected into a batch until commit() is called, which
+        turns the batch into one undo step. The oldest steps are dropped
+        when the stacks get too big.
+    """
+    def __init__(self, world, max_bytes=1 << 22):
+        """ Parameters:
+              world ....... the Elements instance
+              max_bytes ... memory to use for undo and redo steps at most
+        """
+        self.world = world
+        self.max_bytes = max_bytes
+        self.applying = False
+        self.clear()
+
+    def clear(self):
+        """ Forget all steps and the current batch
+        """
+        self.undo_steps = []
+        self.redo_steps = []
+        self.size = 0
+        self._clear_batch()
+
+    def _clear_batch(self):
+        self.new_bodies = []
+        self.new_joints = []
+        self.removed = []
+        self.changed = {}
+
+    def _recording(self):
+        # Loading a scene or applying a step is not an edit
+        return not self.applying and self.world.loader is None
+
+    # Called by Elements when something is edited
+    def add_body(self, id):
+        if self._recording():
+            self.new_bodies.append(id)
+
+    def add_joint(self, id):
+        if self._recording():
+            self.new_joints.append(id)
+
+    def remove_body(self, body):
+        """ Called before a body is destroyed
+        """
+        if not self._recording():
+            return
+        id = self.world.get_id(body)
+        if id in self.new_bodies:
+            self.new_bodies.remove(id)
+            return
+        # Joints made in this batch get removed on undo anyway
+        joints = []
+        jointnode = body.GetJointList()
+        while jointnode:
+            if self.world.get_id(jointnode.joint) not in self.new_joints:
+                joints.append(jointnode.joint)
+            jointnode = jointnode.next
+        self.removed.append(scenefile.dumps(self.world, {}, [body], joints))
+
+    def remove_joint(self, joint):
+        """ Called before a joint is destroyed
+        """
+        if not self._recording():
+            return
+        id = self.world.get_id(joint)
+        if id in self.new_joints:
+            self.new_joints.remove(id)
+            return
+        self.removed.append(scenefile.dumps(self.world, {}, [], [joint]))
+
+    def change_body(self, body):
+        """ Called before a body is changed by hand
+        """
+        if not self._recording():
+            return
+        id = self.world.get_id(body)
+        if id in self.new_bodies or self.changed.has_key(id):
+            return
+        self.changed[id] = scenefile.dumps(self.world, {}, [body], [])
+
+    def commit(self):
+        """ Make the edits since the last commit one undo step
+        """
+        step = []
+        if self.new_joints:
+            step.append((REMOVE_JOINTS, _ids(self.new_joints)))
+        if self.new_bodies:
+            step.append((REMOVE_BODIES, _ids(self.new_bodies)))
+        # Things destroyed last come back first, so joints find their bodies
+        for payload in reversed(self.removed):
+            step.append((ADD, payload))
+        for payload in self.changed.values():
+            step.append((STATE, payload))
+        self._clear_batch()
+        if not step:
+            return
+
+        self.undo_steps.append(step)
+        self.size += _size(step)
+        for redo in self.redo_steps:
+            self.size -= _size(redo)
+        self.redo_steps = []
+        self._evict()
+
+    def _evict(self):
+        # Drop the oldest undo steps, then the farthest redo steps
+        while self.size > self.max_bytes and self.undo_steps:
+            self.size -= _size(self.undo_steps.pop(0))
+        while self.size > self.max_bytes and self.redo_steps:
+            self.size -= _size(self.redo_steps.pop(0))
+
+    def can_undo(self):
+        return len(self.undo_steps) > 0
+
+    def can_redo(self):
+        return len(self.redo_steps) > 0
+
+    def undo(self):
+        """ Revert the last step
+
+            Return: True if there was a step to undo
+        """
+        self.commit()
+        if not self.undo_steps:
+            return False
+        step = self.undo_steps.pop()
+        self.size -= _size(step)
+        redo = self._apply(step)
+        self.redo_steps.append(redo)
+        self.size += _size(redo)
+        self._evict()
+        return True
+
+    def redo(self):
+        """ Apply the last undone step again
+
+            Return: True if there was a step to redo
+        """
+        self.commit()
+        if not self.redo_steps:
+            return False
+        step = self.redo_steps.pop()
+        self.size -= _size(step)
+        undo = self._apply(step)
+        self.undo_steps.append(undo)
+        self.size += _size(undo)
+        self._evict()
+        return True
+
+    def _apply(self, step):
+        # Apply the operations of a step, return the step reverting them
+        world = self.world
+        inverse = []
+        self.applying = True
+        try:
+            for op, payload in step:
+                if op == REMOVE_JOINTS:
+                    joints = [world.get_joint(id) for id in _unpack_ids(payload)]
+                    joints = [joint for joint in joints if joint is not None]
+                    if joints:
+                        inverse.append((ADD, scenefile.dumps(world, {}, [], joints)))
+                    for joint in joints:
+                        world.destroy_joint(joint)
+
+                elif op == REMOVE_BODIES:
+                    bodies = [world.get_body(id) for id in _unpack_ids(payload)
+                              if id != 0]
+                    bodies = [body for body in bodies if body is not None]
+                    joints = {}
+                    for body in bodies:
+                        jointnode = body.GetJointList()
+                        while jointnode:
+                            joints[world.get_id(jointnode.joint)] = jointnode.joint
+                            jointnode = jointnode.next
+                    if bodies:
+                        inverse.append((ADD, scenefile.dumps(world, {}, bodies,
+                                                             joints.values())))
+                    for body in bodies:
+                        world.destroy_body(body)
+
+                elif op == ADD:
+                    scene = scenefile.Scene(payload)
+                    bodies = []
+                    joints = []
+                    for i in xrange(scene.body_count):
+                        bodies.append(world.get_id(scene.create_body(world, i)))
+                    for i in xrange(scene.joint_count):
+                        joint = scene.create_joint(world, i)
+                        if joint is not None:
+                            joints.append(world.get_id(joint))
+                    if joints:
+                        inverse.append((REMOVE_JOINTS, _ids(joints)))
+                    if bodies:
+                        inverse.append((REMOVE_BODIES, _ids(bodies)))
+
+                elif op == STATE:
+                    scene = scenefile.Scene(payload)
+                    bodies = [world.get_body(scene.body_id(i))
+                              for i in xrange(scene.body_count)]
+                    bodies = [body for body in bodies if body is not None]
+                    if bodies:
+                        inverse.append((STATE, scenefile.dumps(world, {}, bodies, [])))
+                    for body in bodies:
+                        world.touch(body)
+                    for i in xrange(scene.body_count):
+                        scene.update_body(world, i)
+        finally:
+            self.applying = False
+
+        inverse.reverse()
+        return inverse
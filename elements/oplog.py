@@ -0,0 +1,377 @@
+"""
+This file is part of the 'Elements' Project
+Elements is a 2D Physics API for Python (supporting pybox2d)
+
+Copyright (C) 2008, The Elements Team, <elements@linuxuser.at>
+
+Home:  http://elements.linuxuser.at
+IRC:   #elements on irc.freenode.org
+
+Code:  http://www.assembla.com/wiki/show/elements
+       svn co http://svn2.assembla.com/svn/elements
+
+License:  GPLv3 | See LICENSE for the full text
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Write-ahead log of edits, for crash safe autosaving
+
+The log starts from the base, the journal file the world was last loaded
+from or saved to, and uses these files:
+
+  <path>.dirty ..... written before the first edit after the base, holds the
+                     crc32 of the base and the generation of the first log
+  <path>.snap ...... a binary scene (see scenefile.py) of generation g, when
+                     the log was compacted since
+  <path>.log.<g> ... the edits made since the base or that snapshot
+
+Every record is an op code, the payload length and a crc32 of the payload,
+followed by the payload. Created bodies and joints and changed bodies are
+stored as small binary scenes, removed ones as lists of ids.
+
+Recovery only happens if the marker is still there (an unclean exit) and
+the journal file being opened is the base: it loads the snapshot (or the
+base) and replays the logs up to the first incomplete record. Saving to the
+journal or closing without unsaved edits removes all of the files.
+"""
+import os
+import struct
+import time
+import zlib
+from threading import Thread
+
+import scenefile
+
+# Op codes
+ADD = 1             # a scene of new bodies and joints
+UPDATE = 2          # a scene with the new state of existing bodies
+REMOVE_BODIES = 3   # ids of destroyed bodies
+REMOVE_JOINTS = 4   # ids of destroyed joints
+
+_record = struct.Struct('<BIi')  # op, payload length, crc32
+_marker = struct.Struct('<BiI')  # has a base, crc32 of the base, generation
+
+def _ids(ids):
+    # Pack a list of ids
+    return struct.pack('<%dI' % len(ids), *ids)
+
+def _unpack_ids(payload):
+    return struct.unpack('<%dI' % (len(payload) / 4), payload)
+
+class OpLog:
+    """ Records the edits made to an Elements world in an append-only log.
+        Edits are collected during a frame and written by commit(), which
+        the main loop calls once per frame. The log is compacted into a
+        new snapshot once it grows beyond max_size bytes.
+    """
+    max_size = 1 << 20          # compact when the log gets bigger (bytes)
+    sync_interval = 2.0         # seconds between two fsyncs of the log
+
+    def __init__(self, world, path):
+        """ Parameters:
+              world ... the Elements instance to record
+              path .... base path of the snapshot and log files
+        """
+        self.world = world
+        self.path = path
+        self.generation = 0
+        self.file = None
+        self.size = 0
+        self.last_sync = 0.0
+        self.thread = None
+        self.base = None        # crc32 of the base (or the scenefile.Writer
+                                # still writing it), None if there is none
+        self.dirty = False      # the marker is written
+        self._clear()
+
+    def _clear(self):
+        # Forget the edits of the current frame
+        self.new_bodies = []
+        self.new_joints = []
+        self.changed = {}
+        self.removed_bodies = []
+        self.removed_joints = []
+
+    def _logpath(self, generation):
+        return "%s.log.%d" % (self.path, generation)
+
+    def _mark_dirty(self):
+        # Tell recovery that there are edits the journal doesn't have
+        if self.dirty:
+            return
+        if isinstance(self.base, scenefile.Writer):
+            # Edited while the journal file is being written
+            self.base.join()
+            self.base = self.base.crc
+        f = open(self.path + '.dirty', 'wb')
+        f.write(_marker.pack(self.base is not None, self.base or 0,
+                             self.generation))
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        self.dirty = True
+
+    def _read_marker(self):
+        # Return: (crc32 of the base, generation) or None
+        try:
+            f = open(self.path + '.dirty', 'rb')
+            data = f.read()
+            f.close()
+        except IOError:
+            return None
+        if len(data) < _marker.size:
+            return None
+        has_base, base, generation = _marker.unpack_from(data)
+        if not has_base:
+            return None
+        return base, generation
+
+    def _wait(self):
+        # Finish a running compaction and close the log file
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.size = 0
+
+    def _remove_files(self):
+        # The marker goes first, without it the rest is never used
+        directory, name = os.path.split(self.path)
+        for suffix in ('.dirty', '.snap', '.snap.tmp'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+        for filename in os.listdir(directory or '.'):
+            if filename.startswith(name + '.log.'):
+                os.remove(os.path.join(directory, filename))
+        self.dirty = False
+
+    # Called by Elements when something is edited
+    def add_body(self, id):
+        self.new_bodies.append(id)
+
+    def add_joint(self, id):
+        self.new_joints.append(id)
+
+    def change_body(self, id):
+        self.changed[id] = True
+
+    def remove_body(self, id):
+        if id in self.new_bodies:
+            self.new_bodies.remove(id)
+        else:
+            self.removed_bodies.append(id)
+        self.changed.pop(id, None)
+
+    def remove_joint(self, id):
+        if id in self.new_joints:
+            self.new_joints.remove(id)
+        else:
+            self.removed_joints.append(id)
+
+    def commit(self):
+        """ Append the edits of this frame to the log
+        """
+        world = self.world
+        records = []
+        if self.removed_joints:
+            records.append((REMOVE_JOINTS, _ids(self.removed_joints)))
+        if self.removed_bodies:
+            records.append((REMOVE_BODIES, _ids(self.removed_bodies)))
+
+        # Ids of things destroyed again are simply not found any more
+        bodies = [world.get_body(id) for id in self.new_bodies]
+        bodies = [body for body in bodies if body is not None]
+        joints = [world.get_joint(id) for id in self.new_joints]
+        joints = [joint for joint in joints if joint is not None]
+        if bodies or joints:
+            records.append((ADD, scenefile.dumps(world, {}, bodies, joints)))
+
+        changed = [world.get_body(id) for id in self.changed.keys()
+                   if id not in self.new_bodies]
+        changed = [body for body in changed if body is not None]
+        if changed:
+            records.append((UPDATE, scenefile.dumps(world, {}, changed, [])))
+
+        self._clear()
+        if not records:
+            return
+
+        self._mark_dirty()
+        if self.file is None:
+            self.file = open(self._logpath(self.generation), 'ab')
+            self.size = self.file.tell()
+        for op, payload in records:
+            self.file.write(_record.pack(op, len(payload), zlib.crc32(payload)))
+            self.file.write(payload)
+            self.size += _record.size + len(payload)
+        # Flushed data survives a crash of the activity, fsync a power loss
+        self.file.flush()
+        now = time.time()
+        if now - self.last_sync > self.sync_interval:
+            os.fsync(self.file.fileno())
+            self.last_sync = now
+
+        if self.size > self.max_size:
+            self.compact()
+
+    def compact(self):
+        """ Write a snapshot of the world and start a new, empty log. The
+            world is captured right away, packing and writing it happens in
+            the background.
+        """
+        self._clear()
+        self._wait()
+        # The snapshot isn't the base, so recovery must use it
+        self._mark_dirty()
+
+        self.generation += 1
+        captured = scenefile.capture(self.world,
+                                     {'oplog_generation': self.generation})
+
+        self.thread = Thread(target=self._write_snapshot,
+                             args=(captured, self.generation))
+        self.thread.start()
+
+    def _write_snapshot(self, captured, generation):
+        # Replace the snapshot, then drop the logs it contains
+        data = scenefile.pack(captured)
+        tmp = self.path + '.snap.tmp'
+        f = open(tmp, 'wb')
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.rename(tmp, self.path + '.snap')
+        for g in xrange(generation):
+            if os.path.exists(self._logpath(g)):
+                os.remove(self._logpath(g))
+
+    def rebase(self, base):
+        """ Make the contents of a journal file the new base, after the world
+            was saved to it or loaded from it. The log, snapshot and marker
+            aren't needed any more and are removed.
+
+            Parameters:
+              base ... the contents of the journal file, or the
+                       scenefile.Writer which is writing it
+        """
+        self._clear()
+        self._wait()
+        self._remove_files()
+        if isinstance(base, scenefile.Writer):
+            self.base = base
+        else:
+            self.base = zlib.crc32(base)
+        self.generation += 1
+
+    def close(self):
+        """ Write the pending edits and wait for a running compaction. The
+            files are removed if there are no edits since the base.
+        """
+        self.commit()
+        if self.file is not None:
+            os.fsync(self.file.fileno())
+        self._wait()
+        if not self.dirty:
+            self._remove_files()
+
+    def recover(self, path):
+        """ Restore the world after an unclean exit, if the log is based on
+            the journal file being opened. Otherwise the files of the log are
+            removed and the file becomes the base.
+
+            Parameters:
+              path ... the journal file to open
+
+            Return: True if the world was recovered, else the caller still
+                    has to load the file
+        """
+        f = open(path, 'rb')
+        data = f.read()
+        f.close()
+        marker = self._read_marker()
+        if marker is None or marker[0] != zlib.crc32(data):
+            # A clean exit, or the log of another version of the entry
+            self.rebase(data)
+            return False
+
+        self._clear()
+        self._wait()
+        base, generation = marker
+        snap = self.path + '.snap'
+        world = self.world
+        # The replayed edits were made before the crash, they can't be undone
+        history = world.history
+        world.oplog = world.history = None
+        try:
+            if os.path.exists(snap):
+                additional_vars = {}
+                world.binary_load(snap, additional_vars)
+                generation = additional_vars.get('oplog_generation', generation)
+            else:
+                world.load(path)
+            # A crash during compaction can leave the next log behind as well
+            g = generation
+            while os.path.exists(self._logpath(g)):
+                self._replay(self._logpath(g))
+                g += 1
+        finally:
+            world.oplog = self
+            world.history = history
+        if history is not None:
+            history.clear()
+
+        self.base = base
+        self.dirty = True
+        self.generation = max(generation, g - 1)
+        # Fold the replayed log into a new snapshot
+        self.compact()
+        return True
+
+    def _replay(self, path):
+        f = open(path, 'rb')
+        data = f.read()
+        f.close()
+
+        world = self.world
+        at = 0
+        while at + _record.size <= len(data):
+            op, length, crc = _record.unpack_from(data, at)
+            payload = data[at + _record.size:at + _record.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                # The write of this record was cut off by the crash
+                break
+            at += _record.size + length
+
+            if op == REMOVE_JOINTS:
+                for id in _unpack_ids(payload):
+                    joint = world.get_joint(id)
+                    if joint is not None:
+                        world.destroy_joint(joint)
+            elif op == REMOVE_BODIES:
+                for id in _unpack_ids(payload):
+                    body = world.get_body(id)
+                    if body is not None and id != 0:
+                        world.destroy_body(body)
+            elif op == ADD:
+                scene = scenefile.Scene(payload)
+                for i in xrange(scene.body_count):
+                    scene.create_body(world, i)
+                for i in xrange(scene.joint_count):
+                    scene.create_joint(world, i)
+            elif op == UPDATE:
+                scene = scenefile.Scene(payload)
+                for i in xrange(scene.body_count):
+                    scene.update_body(world, i)
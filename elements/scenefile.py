@@ -0,0 +1,523 @@
+"""
+This file is part of the 'Elements' Project
+Elements is a 2D Physics API for Python (supporting pybox2d)
+
+Copyright (C) 2008, The Elements Team, <elements@linuxuser.at>
+
+Home:  http://elements.linuxuser.at
+IRC:   #elements on irc.freenode.org
+
+Code:  http://www.assembla.com/wiki/show/elements
+       svn co http://svn2.assembla.com/svn/elements
+
+License:  GPLv3 | See LICENSE for the full text
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Binary scene files
+
+A scene file is a header followed by fixed size tables, all little endian:
+
+  header ..... magic, version, flags and the size of each table
+  bodies ..... one row per body, pointing into the shape table
+  shapes ..... one row per shape, polygons point into the vertex pool
+  joints ..... one row per joint, bodies are referenced by their id
+  vertices ... pool of (x, y) float pairs, equal polygons share their run
+  extras ..... cjson encoded userData keys besides 'id' and 'color', and
+               the additional vars
+
+Box2D works in single precision, so floats are stored as 32 bit.
+"""
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from copy import deepcopy
+from threading import Thread
+
+from elements import box2d
+
+MAGIC = 'ELMB'
+VERSION = 1
+
+NO_ID = 0xFFFFFFFF
+
+# Shape and joint types
+CIRCLE = 1
+POLYGON = 2
+DISTANCE = 1
+REVOLUTE = 2
+
+# Body flags
+DYNAMIC = 1
+COLOR = 2
+
+_header = struct.Struct('<4sHHIIIII')   # magic, version, flags, bodies, shapes, joints, vertices, extras
+_body = struct.Struct('<IBBBBffffffIH') # id, flags, r, g, b, x, y, angle, angularVelocity, vx, vy, first shape, shapes
+_shape = struct.Struct('<BffffffIH')    # type, density, restitution, friction, radius, x, y, first vertex, vertices
+_joint = struct.Struct('<IBIIBBffffff') # id, type, body1, body2, collideConnected, enableMotor, anchor1, anchor2, motorSpeed, maxMotorTorque
+
+def is_scenefile(data):
+    """ Return: True if data (the start of a file is enough) is a binary scene
+    """
+    return data[:len(MAGIC)] == MAGIC
+
+def _split_userdata(userData):
+    # Return: (id, color or None, the remaining keys or None)
+    if type(userData) != type({}):
+        return NO_ID, None, None
+    extras = userData.copy()
+    id = extras.pop('id', None)
+    if id is None:
+        id = NO_ID
+    color = extras.pop('color', None)
+    if color is not None:
+        try:
+            r, g, b = [int(c) for c in color]
+            if max(r, g, b) > 255 or min(r, g, b) < 0:
+                raise ValueError
+            color = (r, g, b)
+        except (TypeError, ValueError):
+            # Keep colors which don't fit into 3 bytes as they are
+            extras['color'] = color
+            color = None
+    if not extras:
+        extras = None
+    return id, color, extras
+
+def capture(world, additional_vars={}, bodies=None, joints=None):
+    """ Read the bodies and joints of a world into plain values, which pack
+        turns into a binary scene. Only this part needs the world, so the
+        packing can happen on another thread.
+
+        Parameters:
+          world ............ the Elements instance
+          additional_vars .. a dict of other values to store (cjson encodable)
+          bodies ........... the bodies to capture (default: all)
+          joints ........... the joints to capture (default: all)
+
+        Return: the captured scene, to pass to pack
+    """
+    ground = world.world.GetGroundBody()
+    if bodies is None:
+        bodies = world.world.GetBodyList()
+    if joints is None:
+        joints = world.world.GetJointList()
+    body_rows = []
+    shapes = []
+    joint_rows = []
+    vertices = array('f')
+    runs = {}
+    body_extras = []
+    joint_extras = []
+
+    for body in bodies:
+        if body == ground:
+            continue
+        first = len(shapes)
+        for shape in body.GetShapeList():
+            shapename = shape.__class__.__name__
+            if shapename == "b2CircleShape":
+                x, y = shape.localPosition.tuple()
+                shapes.append((CIRCLE, shape.density, shape.restitution,
+                               shape.friction, shape.radius, x, y, 0, 0))
+            elif shapename == "b2PolygonShape":
+                points = tuple([tuple(v) for v in shape.vertices])
+                offset = runs.get(points)
+                if offset is None:
+                    offset = runs[points] = len(vertices) / 2
+                    for x, y in points:
+                        vertices.append(x)
+                        vertices.append(y)
+                shapes.append((POLYGON, shape.density, shape.restitution,
+                               shape.friction, 0.0, 0.0, 0.0, offset,
+                               len(points)))
+
+        id, color, extras = _split_userdata(body.userData)
+        if extras is not None:
+            body_extras.append([len(body_rows), deepcopy(extras)])
+        flags = 0
+        if body.IsDynamic():
+            flags |= DYNAMIC
+        if color is None:
+            color = (0, 0, 0)
+        else:
+            flags |= COLOR
+        x, y = body.position.tuple()
+        vx, vy = body.linearVelocity.tuple()
+        body_rows.append((id, flags, color[0], color[1], color[2],
+                          x, y, body.angle, body.angularVelocity,
+                          vx, vy, first, len(shapes) - first))
+
+    for joint in joints:
+        jointname = joint.__class__.__name__
+        if jointname == "b2RevoluteJoint":
+            x1, y1 = x2, y2 = joint.GetAnchor1().tuple()
+            row = (REVOLUTE, joint.enableMotor, x1, y1, x2, y2,
+                   joint.motorSpeed, joint.maxMotorTorque)
+        elif jointname == "b2DistanceJoint":
+            x1, y1 = joint.GetAnchor1().tuple()
+            x2, y2 = joint.GetAnchor2().tuple()
+            row = (DISTANCE, False, x1, y1, x2, y2, 0.0, 0.0)
+        else:
+            continue
+
+        body1 = world.get_id(joint.body1)
+        body2 = world.get_id(joint.body2)
+        if body1 is None or body2 is None:
+            continue
+        id, color, extras = _split_userdata(joint.userData)
+        if color is not None:
+            extras = extras or {}
+            extras['color'] = color
+        if extras is not None:
+            joint_extras.append([len(joint_rows), deepcopy(extras)])
+        joint_rows.append((id, row[0], body1, body2, joint.collideConnected,
+                           row[1]) + row[2:])
+
+    return (body_rows, shapes, joint_rows, vertices, body_extras,
+            joint_extras, deepcopy(additional_vars))
+
+def pack(captured):
+    """ Pack a scene read by capture. Doesn't touch the world, so it can
+        run on any thread.
+
+        Return: str
+    """
+    import cjson
+
+    (body_rows, shapes, joint_rows, vertices, body_extras, joint_extras,
+     additional_vars) = captured
+    extras = cjson.encode({'bodies': body_extras, 'joints': joint_extras,
+                           'additional_vars': additional_vars})
+
+    if sys.byteorder != 'little':
+        vertices = array('f', vertices)
+        vertices.byteswap()
+
+    header = _header.pack(MAGIC, VERSION, 0, len(body_rows), len(shapes),
+                          len(joint_rows), len(vertices) / 2, len(extras))
+    return ''.join([header]
+                   + [_body.pack(*row) for row in body_rows]
+                   + [_shape.pack(*row) for row in shapes]
+                   + [_joint.pack(*row) for row in joint_rows]
+                   + [vertices.tostring(), extras])
+
+def dumps(world, additional_vars={}, bodies=None, joints=None):
+    """ Pack the bodies and joints of a world into a binary scene (see
+        capture for the parameters)
+
+        Return: str
+    """
+    return pack(capture(world, additional_vars, bodies, joints))
+
+def write(path, data):
+    """ Write a scene file and wait until it is on disk
+
+        Parameters:
+          path ... file name
+          data ... the scene (see dumps)
+    """
+    f = open(path, 'wb')
+    f.write(data)
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+class Writer(Thread):
+    """ Packs a captured scene (see capture) and writes it to a file on a
+        worker thread. Afterwards crc is the crc32 of what was written.
+    """
+    def __init__(self, path, captured):
+        Thread.__init__(self)
+        self.path = path
+        self.captured = captured
+        self.crc = None
+
+    def run(self):
+        data = pack(self.captured)
+        self.captured = None
+        write(self.path, data)
+        self.crc = zlib.crc32(data)
+
+class Scene:
+    """ A binary scene, read table by table without decoding it as a whole.
+        Bodies and joints are created one at a time, so the caller decides
+        how many to create at once.
+    """
+    def __init__(self, data):
+        """ Parameters:
+              data ... the contents of a scene file (str)
+        """
+        import cjson
+
+        if len(data) < _header.size or not is_scenefile(data):
+            raise ValueError("Not a scene file")
+        (magic, version, flags, self.body_count, self.shape_count,
+         self.joint_count, vertex_count, extras_size) = _header.unpack_from(data)
+        if version > VERSION:
+            raise ValueError("Scene file version %d is not supported" % version)
+
+        self.data = data
+        self.bodies_at = _header.size
+        self.shapes_at = self.bodies_at + self.body_count * _body.size
+        self.joints_at = self.shapes_at + self.shape_count * _shape.size
+        vertices_at = self.joints_at + self.joint_count * _joint.size
+        extras_at = vertices_at + vertex_count * 8
+        if extras_at + extras_size > len(data):
+            raise ValueError("Scene file is truncated")
+
+        self.vertices = array('f')
+        self.vertices.fromstring(data[vertices_at:extras_at])
+        if sys.byteorder != 'little':
+            self.vertices.byteswap()
+
+        extras = cjson.decode(data[extras_at:extras_at + extras_size])
+        self.body_extras = dict(extras['bodies'])
+        self.joint_extras = dict(extras['joints'])
+        self.additional_vars = extras['additional_vars']
+
+    def body_id(self, i):
+        """ Return: the id of body i
+        """
+        return _body.unpack_from(self.data, self.bodies_at + i * _body.size)[0]
+
+    def next_id(self):
+        """ Return: an id above the ids of all bodies and joints of the scene
+        """
+        data = self.data
+        ids = [_body.unpack_from(data, self.bodies_at + i * _body.size)[0]
+               for i in xrange(self.body_count)]
+        ids.extend([_joint.unpack_from(data, self.joints_at + i * _joint.size)[0]
+                    for i in xrange(self.joint_count)])
+        ids = [id for id in ids if id != NO_ID]
+        if not ids:
+            return 1
+        return max(ids) + 1
+
+    def joint_bodies(self, i):
+        """ Return: the ids of the two bodies joint i connects
+        """
+        row = _joint.unpack_from(self.data, self.joints_at + i * _joint.size)
+        return row[2], row[3]
+
+    def create_body(self, world, i):
+        """ Create and register body i
+
+            Parameters:
+              world ... the Elements instance to create it in
+              i ....... the row in the body table
+
+            Return: box2d.b2Body
+        """
+        (id, flags, r, g, b, x, y, angle, angularVelocity, vx, vy,
+         first, count) = _body.unpack_from(self.data,
+                                           self.bodies_at + i * _body.size)
+        userData = deepcopy(self.body_extras.get(i, {}))
+        if flags & COLOR:
+            userData['color'] = (r, g, b)
+
+        bodyDef = box2d.b2BodyDef()
+        bodyDef.position = (x, y)
+        bodyDef.angle = angle
+        bodyDef.userData = userData
+        body = world.world.CreateBody(bodyDef)
+        if id == NO_ID:
+            world.register_body(body)
+        else:
+            world.register_body(body, id)
+        body.angularVelocity = angularVelocity
+        body.linearVelocity = (vx, vy)
+
+        vertices = self.vertices
+        at = self.shapes_at + first * _shape.size
+        for j in xrange(count):
+            (kind, density, restitution, friction, radius, sx, sy,
+             offset, n) = _shape.unpack_from(self.data, at)
+            at += _shape.size
+            if kind == CIRCLE:
+                shapeDef = box2d.b2CircleDef()
+                shapeDef.radius = radius
+                shapeDef.localPosition = (sx, sy)
+            elif kind == POLYGON:
+                shapeDef = box2d.b2PolygonDef()
+                shapeDef.setVertices([(vertices[k], vertices[k+1])
+                                      for k in xrange(2*offset, 2*(offset+n), 2)])
+            else:
+                continue
+            shapeDef.density = density
+            shapeDef.restitution = restitution
+            shapeDef.friction = friction
+            body.CreateShape(shapeDef)
+
+        # Bodies which were static (eg. frozen) stay static
+        if flags & DYNAMIC:
+            body.SetMassFromShapes()
+        return body
+
+    def update_body(self, world, i):
+        """ Give the existing body with the id of body i its saved state:
+            position, velocity, userData, shape properties and whether it
+            is static. The shapes themselves are not replaced.
+
+            Return: box2d.b2Body, or None if there is no such body
+        """
+        (id, flags, r, g, b, x, y, angle, angularVelocity, vx, vy,
+         first, count) = _body.unpack_from(self.data,
+                                           self.bodies_at + i * _body.size)
+        body = world.get_body(id)
+        if body is None or id == 0:
+            return None
+
+        userData = deepcopy(self.body_extras.get(i, {}))
+        if flags & COLOR:
+            userData['color'] = (r, g, b)
+        userData['id'] = id
+        body.userData = userData
+        body.SetXForm((x, y), angle)
+        body.angularVelocity = angularVelocity
+        body.linearVelocity = (vx, vy)
+
+        at = self.shapes_at + first * _shape.size
+        for shape in body.GetShapeList()[:count]:
+            (kind, density, restitution, friction, radius, sx, sy,
+             offset, n) = _shape.unpack_from(self.data, at)
+            at += _shape.size
+            shape.density = density
+            shape.restitution = restitution
+            shape.friction = friction
+
+        if flags & DYNAMIC:
+            body.SetMassFromShapes()
+        else:
+            # A body without mass and inertia is static in Box2D
+            massData = box2d.b2MassData()
+            massData.mass = 0.0
+            massData.I = 0.0
+            massData.center = body.GetLocalCenter()
+            body.SetMass(massData)
+        body.WakeUp()
+        return body
+
+    def create_joint(self, world, i):
+        """ Create and register joint i. Both of its bodies have to exist.
+
+            Return: box2d.b2Joint, or None if a body is missing
+        """
+        (id, kind, body1, body2, collideConnected, enableMotor,
+         x1, y1, x2, y2, motorSpeed, maxMotorTorque) = _joint.unpack_from(
+                                self.data, self.joints_at + i * _joint.size)
+        body1 = world.get_body(body1)
+        body2 = world.get_body(body2)
+        if body1 is None or body2 is None:
+            return None
+
+        if kind == DISTANCE:
+            jointDef = box2d.b2DistanceJointDef()
+            jointDef.Initialize(body1, body2, (x1, y1), (x2, y2))
+        elif kind == REVOLUTE:
+            jointDef = box2d.b2RevoluteJointDef()
+            jointDef.Initialize(body1, body2, (x1, y1))
+            jointDef.enableMotor = bool(enableMotor)
+            jointDef.motorSpeed = motorSpeed
+            jointDef.maxMotorTorque = maxMotorTorque
+        else:
+            return None
+        jointDef.collideConnected = bool(collideConnected)
+
+        userData = deepcopy(self.joint_extras.get(i, {}))
+        jointDef.SetUserData(userData)
+        joint = world.world.CreateJoint(jointDef)
+        if id == NO_ID:
+            world.register_joint(joint)
+        else:
+            world.register_joint(joint, id)
+        return joint
+
+class Loader:
+    """ Fills a world with a scene a chunk of bodies at a time, so a big
+        scene doesn't block the main loop. Joints are created as soon as
+        both of their bodies exist. The simulation and the write-ahead log
+        are paused until the whole scene is there.
+    """
+    def __init__(self, world, scene, additional_vars={}):
+        """ Parameters:
+              world ............ the Elements instance (already cleared)
+              scene ............ the Scene to load
+              additional_vars .. dict to store the scene's additional vars in
+        """
+        self.world = world
+        self.scene = scene
+        self.additional_vars = additional_vars
+        self.next_body = 0
+        self.joints = range(scene.joint_count)
+        self.done = False
+
+        # Bodies added while the scene fills in get ids it doesn't use
+        world._next_id = max(world._next_id, scene.next_id())
+
+        self.run_physics = world.run_physics
+        self.oplog = world.oplog
+        world.run_physics = False
+        world.oplog = None
+
+    def step(self, budget=None):
+        """ Create bodies until the time budget is used up, then the joints
+            whose bodies are there
+
+            Parameters:
+              budget ... seconds to spend, None to load everything
+
+            Return: True when the whole scene is loaded
+        """
+        if self.done:
+            return True
+        world = self.world
+        scene = self.scene
+        start = time.time()
+        while self.next_body < scene.body_count:
+            scene.create_body(world, self.next_body)
+            self.next_body += 1
+            if budget is not None and time.time() - start > budget:
+                break
+
+        joints = []
+        for i in self.joints:
+            body1, body2 = scene.joint_bodies(i)
+            if world.get_body(body1) is None or world.get_body(body2) is None:
+                joints.append(i)
+            else:
+                scene.create_joint(world, i)
+        self.joints = joints
+
+        if self.next_body < scene.body_count:
+            return False
+
+        # Joints still waiting for a body now never get one
+        self.joints = []
+        for (k,v) in scene.additional_vars.items():
+            self.additional_vars[k] = v
+        self.cancel()
+        return True
+
+    def cancel(self):
+        """ Stop loading and resume the simulation and the log
+        """
+        if not self.done:
+            self.done = True
+            self.world.run_physics = self.run_physics
+            self.world.oplog = self.oplog
+            if self.world.loader is self:
+                self.world.loader = None
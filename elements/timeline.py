@@ -0,0 +1,181 @@
+"""
+This file is part of the 'Elements' Project
+Elements is a 2D Physics API for Python (supporting pybox2d)
+
+Copyright (C) 2008, The Elements Team, <elements@linuxuser.at>
+
+Home:  http://elements.linuxuser.at
+IRC:   #elements on irc.freenode.org
+
+Code:  http://www.assembla.com/wiki/show/elements
+       svn co http://svn2.assembla.com/svn/elements
+
+License:  GPLv3 | See LICENSE for the full text
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+from array import array
+
+# Floats stored per body: x, y, angle, vx, vy, angular velocity
+FIELDS = 6
+
+class Timeline:
+    """ Keeps a checkpoint of all moving bodies every few simulation steps,
+        in a ring of a fixed number of slots whose arrays are reused. Any
+        earlier step can be restored by going back to the checkpoint before
+        it and simulating the remaining steps again. The first step after
+        going back drops the checkpoints after it.
+
+        Only positions and velocities are stored: bodies created since a
+        checkpoint stay where they are, destroyed ones don't come back.
+    """
+    def __init__(self, world, slots=64, interval=30, bodies=256, before_step=None):
+        """ Parameters:
+              world ......... the Elements instance
+              slots ......... number of checkpoints to keep
+              interval ...... simulation steps between two checkpoints
+              bodies ........ number of bodies to make room for in advance
+              before_step ... function to call before every simulated step
+                              (eg. to drive motors), or None
+        """
+        self.world = world
+        self.slots = slots
+        self.interval = interval
+        self.before_step = before_step
+        self.settings = (50.0, 10, 8)
+
+        self.steps = [0] * slots
+        self.sizes = [0] * slots
+        self.ids = [array('I', [0]) * bodies for i in xrange(slots)]
+        self.states = [array('f', [0.0]) * (bodies * FIELDS) for i in xrange(slots)]
+        self.clear()
+
+    def clear(self):
+        """ Forget all checkpoints, eg. when a new scene is loaded
+        """
+        self.first = 0      # slot of the oldest checkpoint
+        self.count = 0
+        self.step = 0       # the current step
+        self.head = 0       # the latest step simulated
+
+    def _slot(self, n):
+        # Slot of the n-th oldest checkpoint
+        return (self.first + n) % self.slots
+
+    def record(self, fps, vel_iterations, pos_iterations):
+        """ Called by Elements.update after each simulation step
+        """
+        self.settings = (fps, vel_iterations, pos_iterations)
+        if self.step < self.head:
+            # Going on from an earlier step makes a new future
+            while self.count and self.steps[self._slot(self.count - 1)] > self.step:
+                self.count -= 1
+        self.step += 1
+        self.head = self.step
+        if self.count == 0 or self.step % self.interval == 0:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        if self.count == self.slots:
+            # Overwrite the oldest one
+            self.first = self._slot(1)
+            self.count -= 1
+        slot = self._slot(self.count)
+        self.count += 1
+
+        ids = self.ids[slot]
+        states = self.states[slot]
+        n = 0
+        world = self.world
+        for body in world.world.GetBodyList():
+            if body.IsStatic():
+                continue
+            id = world.get_id(body)
+            if not id:
+                continue
+            if n == len(ids):
+                # Grow the arrays of this slot, they are kept from now on
+                ids.extend(ids)
+                states.extend(states)
+            ids[n] = id
+            k = n * FIELDS
+            states[k], states[k+1] = body.position.tuple()
+            states[k+2] = body.angle
+            states[k+3], states[k+4] = body.linearVelocity.tuple()
+            states[k+5] = body.angularVelocity
+            n += 1
+        self.steps[slot] = self.step
+        self.sizes[slot] = n
+
+    def _restore(self, slot):
+        world = self.world
+        ids = self.ids[slot]
+        states = self.states[slot]
+        for n in xrange(self.sizes[slot]):
+            body = world.get_body(ids[n])
+            if body is None:
+                continue
+            k = n * FIELDS
+            body.SetXForm((states[k], states[k+1]), states[k+2])
+            body.linearVelocity = (states[k+3], states[k+4])
+            body.angularVelocity = states[k+5]
+            body.WakeUp()
+
+    def oldest(self):
+        """ Return: the earliest step that can be restored
+        """
+        if self.count == 0:
+            return self.step
+        return self.steps[self.first]
+
+    def seek(self, step):
+        """ Bring the world back (or forward again) to an earlier step
+
+            Parameters:
+              step ... the step, limited to what is still recorded
+        """
+        if self.count == 0:
+            return
+        step = max(self.oldest(), min(step, self.head))
+
+        # The latest checkpoint at or before the step
+        n = self.count - 1
+        while self.steps[self._slot(n)] > step:
+            n -= 1
+        slot = self._slot(n)
+        self._restore(slot)
+
+        fps, vel_iterations, pos_iterations = self.settings
+        for i in xrange(step - self.steps[slot]):
+            if self.before_step is not None:
+                self.before_step()
+            self.world.world.Step(1.0 / fps, vel_iterations, pos_iterations)
+        self.step = step
+        self.world.version += 1
+
+    def fraction(self):
+        """ Return: the current step as a point of the recorded time
+            (see seek_fraction)
+        """
+        oldest = self.oldest()
+        if self.head <= oldest:
+            return 1.0
+        fraction = float(self.step - oldest) / (self.head - oldest)
+        return max(0.0, min(fraction, 1.0))
+
+    def seek_fraction(self, fraction):
+        """ Seek to a point of the recorded time, 0.0 is the oldest step and
+            1.0 the latest
+        """
+        oldest = self.oldest()
+        self.seek(oldest + int(round(fraction * (self.head - oldest))))
@@ -0,0 +1,814 @@
+"""
+This file is part of the 'Elements' Project
+Elements is a 2D Physics API for Python (supporting Box2D2)
+
+Copyright (C) 2008, The Elements Team, <elements@linuxuser.at>
+
+Home:  http://elements.linuxuser.at
+IRC:   #elements on irc.freenode.org
+
+Code:  http://www.assembla.com/wiki/show/elements
+       svn co http://svn2.assembla.com/svn/elements                     
+
+License:  GPLv3 | See LICENSE for the full text
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.              
+"""
+from heapq import heappush
+from heapq import heappop
+
+from math import fabs
+from math import sqrt
+from math import atan2
+from math import degrees
+from math import acos
+
+from locals import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def calc_center(points):
+    """ Calculate the center of a polygon
+    
+        Return: The center (x,y)
+    """
+    tot_x, tot_y = 0,0
+    for p in points:
+        tot_x += p[0]
+        tot_y += p[1]
+    n = len(points)
+    return (tot_x/n, tot_y/n)
+    
+def poly_center_vertices(pointlist, center=None):
+    """ Rearranges vectors around the center (default: the vertex average)
+    
+        Return: pointlist ([(x, y), ...])
+    """    
+    poly_points_center = []
+    if center is None:
+        center = calc_center(pointlist)
+    cx, cy = center
+    
+    for p in pointlist:
+        x = p[0] - cx
+        y = cy - p[1]
+        poly_points_center.append((x, y))
+    
+    return poly_points_center
+    
+def _polygon_sums(points):
+    # Sums of the shoelace terms needed for area, centroid and inertia,
+    # vectorized with NumPy for larger polygons
+    if numpy is not None and len(points) > 64:
+        p = numpy.asarray(points, dtype=float)
+        x0 = p[:, 0]
+        y0 = p[:, 1]
+        x1 = numpy.roll(x0, -1)
+        y1 = numpy.roll(y0, -1)
+        c = x0*y1 - x1*y0
+        return (c.sum(), ((x0 + x1)*c).sum(), ((y0 + y1)*c).sum(),
+                ((x0*x0 + x0*x1 + x1*x1 + y0*y0 + y0*y1 + y1*y1)*c).sum())
+
+    a = sx = sy = si = 0.0
+    x0, y0 = points[-1]
+    for x1, y1 in points:
+        # (the terms of the edge from the previous to this vertex)
+        c = x0*y1 - x1*y0
+        a += c
+        sx += (x0 + x1)*c
+        sy += (y0 + y1)*c
+        si += (x0*x0 + x0*x1 + x1*x1 + y0*y0 + y0*y1 + y1*y1)*c
+        x0, y0 = x1, y1
+    return a, sx, sy, si
+
+def polygon_mass(points, density=1.0):
+    """ Calculate the mass properties of a polygon (any winding)
+    
+        Return: (mass, (cx, cy), I) -- I is the moment of inertia
+          around the centroid, for a polygon without area the centroid
+          falls back to calc_center and I is 0
+    """
+    a, sx, sy, si = _polygon_sums(points)
+    if fabs(a) <= FLT_EPSILON:
+        return 0.0, calc_center(points), 0.0
+
+    area = a / 2.0
+    cx = sx / (3.0 * a)
+    cy = sy / (3.0 * a)
+    # Polar moment around the origin, moved to the centroid
+    I = si / 12.0 - area * (cx*cx + cy*cy)
+    return fabs(area) * density, (cx, cy), fabs(I) * density
+
+def centroid(points, closed=True):
+    """ Calculate the area weighted center of a polygon. Unlike calc_center
+        it doesn't depend on how densely parts of the outline are sampled.
+        Open strokes (closed=False) and polygons without area use the
+        length weighted center of their segments instead.
+    
+        Return: The center (x,y)
+    """
+    if closed:
+        a, sx, sy, si = _polygon_sums(points)
+        if fabs(a) > FLT_EPSILON:
+            return (sx / (3.0 * a), sy / (3.0 * a))
+
+    tot_x = tot_y = tot_l = 0.0
+    x0, y0 = points[0]
+    for x1, y1 in points[1:]:
+        l = sqrt((x1 - x0)**2 + (y1 - y0)**2)
+        tot_x += (x0 + x1) * l
+        tot_y += (y0 + y1) * l
+        tot_l += l
+        x0, y0 = x1, y1
+    if tot_l == 0.0:
+        return calc_center(points)
+    return (tot_x / (2.0 * tot_l), tot_y / (2.0 * tot_l))
+
+def is_line(vertices, tolerance=25.0):
+    """ Check if passed vertices are a line. Done by comparing
+        the angles of all vectors and check tolerance.
+        
+        Parameters:
+          vertices ... a list of vertices (x, y)
+          tolerance .. how many degrees should be allowed max to be a line
+          
+        Returns: True if line, False if no line
+    """
+    if len(vertices) <= 2:        
+        return True
+
+    # Step 1: Points -> Vectors
+    p_old = vertices[0]
+    alphas = []
+    
+
+    for p in vertices[1:]:
+        x1, y1 = p_old
+        x2, y2 = p
+        p_old = p
+
+        # Create Vector        
+        vx, vy = (x2-x1, y2-y1)
+        
+        # Check Length
+        l = sqrt((vx*vx) + (vy*vy))
+        if l == 0.0: continue
+
+        # Normalize vector
+        vx /= l
+        vy /= l
+        
+        # Append angle
+        if fabs(vx) < 0.2: alpha = 90.0
+        else: alpha = degrees(atan2(vy,vx))
+
+        alphas.append(fabs(alpha))
+        
+    # Sort angles
+    alphas.sort()
+    
+    # Get maximum difference
+    alpha_diff = fabs(alphas[-1] - alphas[0])
+    print "alpha difference:", alpha_diff
+    
+    if alpha_diff < tolerance:
+        return True
+    else:
+        return False
+    
+def reduce_poly_by_angle(vertices, tolerance=10.0, minlen=20):
+    """ This function reduces a poly by the angles of the vectors (detect lines)
+        If the angle difference from one vector to the last > tolerance: use last point
+        If the angle is quite the same, it's on the line
+        
+        Parameters:
+          vertices ... a list of vertices (x, y)
+          tolerance .. how many degrees should be allowed max
+          
+        Returns: (1) New Pointlist, (2) Soft reduced pointlist (reduce_poly())
+    """
+    v_last = vertices[-1]
+    vertices = vxx = reduce_poly(vertices, minlen)
+    
+    p_new =  []
+    p_new.append(vertices[0])
+    
+    dir = None 
+    is_convex = True
+    
+    for i in xrange(len(vertices)-1):
+        if i == 0:
+            p_old = vertices[i]
+            continue
+        
+        x1, y1 = p_old
+        x2, y2 = vertices[i]
+        x3, y3 = vertices[i+1]
+        p_old = vertices[i]
+        
+        # Create Vectors
+        v1x = (x2 - x1) * 1.0
+        v1y = (y2 - y1) * 1.0
+        
+        v2x = (x3 - x2) * 1.0
+        v2y = (y3 - y2) * 1.0
+
+        # Calculate angle
+        a = ((v1x * v2x) + (v1y * v2y))
+        b = sqrt((v1x*v1x) + (v1y*v1y))
+        c = sqrt((v2x*v2x) + (v2y*v2y))
+
+        # No Division by 0 :)        
+        if (b*c) == 0.0: continue
+        
+        # Get the current degrees
+        # We have a bug here sometimes...
+        try:
+            angle = degrees(acos(a / (b*c)))
+        except:
+            # cos=1.0
+            print "cos=", a/(b*c)
+            continue
+            
+        # Check if inside tolerance
+        if fabs(angle) > tolerance:
+            p_new.append(vertices[i])        
+            # print "x", 180-angle, is_left(vertices[i-1], vertices[i], vertices[i+1])
+            
+            # Check if convex:
+            if dir == None:
+                dir = is_left(vertices[i-1], vertices[i], vertices[i+1])
+            else:
+                if dir != is_left(vertices[i-1], vertices[i], vertices[i+1]):
+                    is_convex = False
+                    
+    # We also want to append the last point :)
+    p_new.append(v_last)
+    
+    # Returns: (1) New Pointlist, (2) Soft reduced pointlist (reduce_poly())
+    return p_new, is_convex
+
+    """ OLD FUNCTION: """    
+    # Wipe all points too close to each other
+    vxx = vertices = reduce_poly(vertices, minlen)
+    
+    # Create Output List
+    p_new = []
+    p_new.append(vertices[0])
+    
+    # Set the starting vertice
+    p_old = vertices[0]
+    alpha_old = None
+
+    # For each vector, compare the angle difference to the last one
+    for i in range(1, len(vertices)):
+        x1, y1 = p_old
+        x2, y2 = vertices[i]
+        p_old = (x2, y2)
+
+        # Make Vector
+        vx, vy = (x2-x1, y2-y1)
+    
+        # Vector length
+        l = sqrt((vx*vx) + (vy*vy))
+        
+        # normalize
+        vx /= l
+        vy /= l
+        
+        # Get Angle
+        if fabs(vx) < 0.2:
+            alpha = 90
+        else: 
+            alpha = degrees(atan2(vy,vx))
+
+        if alpha_old == None:
+            alpha_old = alpha
+            continue
+        
+        # Get difference to previous angle
+        alpha_diff = fabs(alpha - alpha_old)        
+        alpha_old = alpha
+        
+        # If the new vector differs from the old one, we add the old point
+        # to the output list, as the line changed it's way :)
+        if alpha_diff > tolerance:
+            #print ">",alpha_diff, "\t", vx, vy, l
+            p_new.append(vertices[i-1])
+
+    # We also want to append the last point :)
+    p_new.append(vertices[-1])
+    
+    # Returns: (1) New Pointlist, (2) Soft reduced pointlist (reduce_poly())
+    return p_new, vxx
+    
+        
+def _segment_distance(p, a, b):
+    # Distance of point p to the segment a-b
+    ax, ay = a
+    dx = b[0] - ax
+    dy = b[1] - ay
+    l = dx*dx + dy*dy
+    if l == 0:
+        return sqrt((p[0]-ax)**2 + (p[1]-ay)**2)
+    t = ((p[0]-ax)*dx + (p[1]-ay)*dy) / float(l)
+    t = max(0.0, min(1.0, t))
+    return sqrt((p[0] - ax - t*dx)**2 + (p[1] - ay - t*dy)**2)
+
+# Douglas-Peucker takes O(n^2) for some outlines (eg. a zigzag). When
+# simplify() has looked at SIMPLIFY_RUN points per input point without
+# finishing, it starts over with the polyline split into runs of at most
+# SIMPLIFY_RUN points, which bounds the work to O(n * SIMPLIFY_RUN).
+SIMPLIFY_RUN = 32
+
+def _farthest(points, i, j):
+    # The point between i and j farthest from the segment i-j
+    # Return: (squared distance, index)
+    ax, ay = points[i]
+    bx, by = points[j]
+    dx = bx - ax
+    dy = by - ay
+    l = float(dx*dx + dy*dy)
+    best, best_k = -1.0, None
+    for k in xrange(i+1, j):
+        px, py = points[k]
+        px -= ax
+        py -= ay
+        if l:
+            t = (px*dx + py*dy) / l
+            if t > 1.0:
+                t = 1.0
+            elif t < 0.0:
+                t = 0.0
+            px -= t*dx
+            py -= t*dy
+        d = px*px + py*py
+        if d > best:
+            best, best_k = d, k
+    return best, best_k
+
+def _douglas_peucker(points, tolerance, max_vertices, run, budget):
+    # The indices of the points simplify() keeps, None if it took more
+    # than budget point tests. The ends of runs of run points are kept.
+    n = len(points)
+    keep = []
+    heap = []
+    limit = tolerance * tolerance
+    for i in xrange(0, n - 1, run):
+        j = min(i + run, n - 1)
+        keep.append(i)
+        d, k = _farthest(points, i, j)
+        budget -= j - i
+        if k is not None:
+            heappush(heap, (-d, i, j, k))
+    keep.append(n - 1)
+
+    while heap and len(keep) < max_vertices:
+        d, i, j, k = heappop(heap)
+        if -d <= limit:
+            break
+        keep.append(k)
+        for a, b in ((i, k), (k, j)):
+            if b - a > 1:
+                d, m = _farthest(points, a, b)
+                heappush(heap, (-d, a, b, m))
+                budget -= b - a
+        if budget < 0:
+            return None
+
+    keep.sort()
+    return keep
+
+def simplify(points, tolerance=4.0, max_vertices=None):
+    """ Simplify a polyline (or closed polygon, first == last point) with
+        the Douglas-Peucker algorithm. The most significant point is added
+        first, so the simplification stops either when no point is farther
+        than tolerance from the result, or when the result has max_vertices
+        points. The work is bounded, see SIMPLIFY_RUN.
+        
+        Parameters:
+          points ....... a list of vertices (x, y)
+          tolerance .... maximum distance of a dropped point to the result
+          max_vertices . maximum number of points to return (default: any)
+          
+        Return: The simplified list of (x,y), a subset of points
+    """
+    n = len(points)
+    if n < 3:
+        return list(points)
+    if max_vertices is None:
+        max_vertices = n
+
+    keep = _douglas_peucker(points, tolerance, max_vertices, n - 1,
+                            n * SIMPLIFY_RUN)
+    if keep is None:
+        if (n - 2) / SIMPLIFY_RUN + 2 > max_vertices:
+            # No room for the ends of the runs, but adding at most
+            # max_vertices points takes O(n * max_vertices) anyway
+            run = n - 1
+        else:
+            run = SIMPLIFY_RUN
+        keep = _douglas_peucker(points, tolerance, max_vertices, run, n * n)
+    return [points[i] for i in keep]
+
+class StrokeFilter:
+    """ Simplify a stroke while it is being drawn, one point at a time.
+        Points closer than min_distance to the previous one are dropped,
+        and a point only becomes a vertex once the stroke leaves the
+        corridor of +/- tolerance around the line from the last vertex.
+        At most max_pending points are held back for that test, so the
+        work per point and the memory stay bounded. A running flag keeps
+        track of whether all corners turn the same way.
+    """
+    def __init__(self, start, tolerance=4.0, min_distance=3.0, max_pending=32):
+        self.vertices = [tuple(start)]
+        self.pending = []
+        self.count = 1
+        self.tolerance = tolerance
+        self.min_distance = min_distance
+        self.max_pending = max_pending
+        self.turn = 0
+        self.convex = True
+
+    def add(self, p):
+        """ Feed the next point of the stroke
+        
+            Parameters:
+              p ... the position (x, y)
+        """
+        p = tuple(p)
+        self.count += 1
+        if self.pending:
+            last = self.pending[-1]
+        else:
+            last = self.vertices[-1]
+        dx = p[0] - last[0]
+        dy = p[1] - last[1]
+        if dx*dx + dy*dy < self.min_distance * self.min_distance:
+            return
+
+        if len(self.pending) >= self.max_pending:
+            self._commit(last)
+        else:
+            a = self.vertices[-1]
+            for q in self.pending:
+                if _segment_distance(q, a, p) > self.tolerance:
+                    self._commit(last)
+                    break
+        self.pending.append(p)
+
+    def _commit(self, p):
+        # Make p the next vertex and update the convexity flag
+        if len(self.vertices) > 1:
+            turn = is_left(self.vertices[-2], self.vertices[-1], p)
+            if turn != 0:
+                if self.turn == 0:
+                    self.turn = turn
+                elif turn != self.turn:
+                    self.convex = False
+        self.vertices.append(p)
+        self.pending = []
+
+    def points(self):
+        """ Return: The simplified stroke so far, ending at the latest point
+        """
+        if self.pending:
+            return self.vertices + [self.pending[-1]]
+        return list(self.vertices)
+
+    def is_convex(self):
+        """ Test if the stroke, when closed, is a convex polygon. The running
+            flag rejects most concave strokes without looking at the points.
+            
+            Return: True if convex
+        """
+        if not self.convex:
+            return False
+        # On closing, the last point is replaced by the first one
+        points = self.points()[:-1]
+        return len(points) > 2 and is_convex(points)
+
+# The following functions is_left, reduce_poly and is_convex are 
+# from the pymunk project (http://code.google.com/p/pymunk/)
+def is_left(p0, p1, p2):
+    """Test if p2 is left, on or right of the (infinite) line (p0,p1).
+    
+    :return: > 0 for p2 left of the line through p0 and p1
+        = 0 for p2 on the line
+        < 0 for p2 right of the line
+    """
+    sorting = (p1[0] - p0[0])*(p2[1]-p0[1]) - (p2[0]-p0[0])*(p1[1]-p0[1])
+    if sorting > 0: return 1
+    elif sorting < 0: return -1 
+    else: return 0
+
+def is_convex(points):
+    """Test if a polygon (list of (x,y)) is strictly convex or not.
+    
+    :return: True if the polygon is convex, False otherwise
+    """
+    #assert len(points) > 2, "not enough points to form a polygon"
+    
+    p0 = points[0]
+    p1 = points[1]
+    p2 = points[2]
+
+    xc, yc = 0, 0
+    is_same_winding = is_left(p0, p1, p2)
+    for p2 in points[2:] + [p0] + [p1]:
+        if is_same_winding != is_left(p0, p1, p2): 
+            return False
+        a = p1[0] - p0[0], p1[1] - p0[1] # p1-p0
+        b = p2[0] - p1[0], p2[1] - p1[1] # p2-p1
+        if sign(a[0]) != sign(b[0]): xc +=1
+        if sign(a[1]) != sign(b[1]): yc +=1
+        p0, p1 = p1, p2
+   
+    return xc <= 2 and yc <= 2
+
+def sign(x): 
+    if x < 0: return -1 
+    else: return 1
+
+
+def reduce_poly(points, tolerance=50):
+    """Remove close points to simplify a polyline
+    tolerance is the min distance between two points squared.
+    
+    :return: The reduced polygon as a list of (x,y)
+    """
+    curr_p = points[0]
+    reduced_ps = [points[0]]
+    
+    for p in points[1:]:
+        x1, y1 = curr_p
+        x2, y2 = p
+        dx = fabs(x2 - x1)
+        dy = fabs(y2 - y1)
+        l = sqrt((dx*dx) + (dy*dy))
+        if l > tolerance:
+            curr_p = p
+            reduced_ps.append(p)
+            
+    return reduced_ps
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+def convex_hull(points):
+    """Create a convex hull from a list of points.
+    This function uses Andrew's monotone chain algorithm. Collinear and
+    duplicate points are dropped and the passed list is not modified.
+    
+    :return: Convex hull as a list of (x,y), counter-clockwise
+    """
+    points = set([tuple(p) for p in points])
+    if numpy is not None and len(points) > 64:
+        points = _hull_prefilter(points)
+    points = sorted(points)
+    if len(points) < 3:
+        return points
+
+    lower = []
+    for p in points:
+        while len(lower) > 1 and _cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+
+    upper = []
+    for p in reversed(points):
+        while len(upper) > 1 and _cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+
+    # The last point of each chain is the first one of the other
+    return lower[:-1] + upper[:-1]
+
+def _hull_prefilter(points):
+    """Drop all points strictly inside the quadrilateral of the extreme
+    points (Akl-Toussaint), vectorized with NumPy. They can't be on the hull.
+    """
+    points = list(points)
+    pts = numpy.array(points, dtype=float)
+    x = pts[:, 0]
+    y = pts[:, 1]
+    quad = [pts[x.argmin()], pts[y.argmin()], pts[x.argmax()], pts[y.argmax()]]
+    if signed_area(quad) < 0:
+        quad.reverse()
+
+    inside = numpy.ones(len(pts), dtype=bool)
+    for k in xrange(4):
+        ax, ay = quad[k - 1]
+        bx, by = quad[k]
+        inside &= (bx - ax) * (y - ay) - (by - ay) * (x - ax) > 0
+    return [points[i] for i in numpy.nonzero(~inside)[0]]
+
+def signed_area(points):
+    """ Calculate the signed area of a polygon (shoelace formula)
+    
+        Return: area, > 0 for counter-clockwise polygons
+    """
+    if numpy is not None and len(points) > 64:
+        p = numpy.asarray(points, dtype=float)
+        x = p[:, 0]
+        y = p[:, 1]
+        return (x*numpy.roll(y, -1) - numpy.roll(x, -1)*y).sum() / 2.0
+
+    a = 0.0
+    x1, y1 = points[-1]
+    for x2, y2 in points:
+        a += x1 * y2 - x2 * y1
+        x1, y1 = x2, y2
+    return a / 2.0
+
+def _inside_triangle(p, a, b, c):
+    # True if p is inside (or on the border of) the ccw triangle a, b, c
+    return (c[0]-b[0])*(p[1]-b[1]) - (c[1]-b[1])*(p[0]-b[0]) >= 0.0 and \
+           (a[0]-c[0])*(p[1]-c[1]) - (a[1]-c[1])*(p[0]-c[0]) >= 0.0 and \
+           (b[0]-a[0])*(p[1]-a[1]) - (b[1]-a[1])*(p[0]-a[0]) >= 0.0
+
+def triangulate(points):
+    """ Triangulate a simple polygon by ear clipping. The remaining outline
+        is kept in a doubly linked ring of vertex indices, and only reflex
+        vertices (with a bounding box rejection) are tested against each
+        candidate ear. Collinear and duplicate vertices are dropped.
+    
+        Return: [((x,y), (x,y), (x,y)), ...] counter-clockwise triangles,
+          or [] if the polygon can't be triangulated (eg. self intersecting)
+    """
+    eps = 0.0000000001
+
+    vertices = [tuple(p) for p in points]
+    if len(vertices) > 1 and vertices[0] == vertices[-1]:
+        vertices.pop() # closed outline, drop the duplicate end point
+    n = len(vertices)
+    if n < 3:
+        return []
+
+    # Force counter-clockwise polygon
+    area = signed_area(vertices)
+    if area <= 0:
+        vertices.reverse()
+        area = -area
+
+    prev = range(-1, n - 1)
+    prev[0] = n - 1
+    next = range(1, n + 1)
+    next[-1] = 0
+
+    def cross(i):
+        ax, ay = vertices[prev[i]]
+        bx, by = vertices[i]
+        cx, cy = vertices[next[i]]
+        return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+    reflex = set([i for i in xrange(n) if cross(i) <= eps])
+
+    def is_ear(u, v, w):
+        a, b, c = vertices[u], vertices[v], vertices[w]
+        minx, maxx = min(a[0], b[0], c[0]), max(a[0], b[0], c[0])
+        miny, maxy = min(a[1], b[1], c[1]), max(a[1], b[1], c[1])
+        for r in reflex:
+            p = vertices[r]
+            if p[0] < minx or p[0] > maxx or p[1] < miny or p[1] > maxy:
+                continue
+            if p == a or p == b or p == c:
+                continue
+            if _inside_triangle(p, a, b, c):
+                return False
+        return True
+
+    # Remove n-2 vertices, creating 1 triangle every time
+    triangles = []
+    nv = n
+    count = nv # error detection
+    v = 0
+    while nv > 3:
+        if count <= 0:
+            return [] # no ear left, probably a bad polygon
+        count -= 1
+        u = prev[v]
+        w = next[v]
+        c = cross(v)
+        if -eps <= c <= eps:
+            # Collinear or duplicate vertex, drop it without a triangle
+            pass
+        elif v not in reflex and is_ear(u, v, w):
+            triangles.append((vertices[u], vertices[v], vertices[w]))
+        else:
+            v = w
+            continue
+
+        # Unlink v, its neighbours may have become convex
+        next[u] = w
+        prev[w] = u
+        reflex.discard(v)
+        nv -= 1
+        for i in (u, w):
+            if i in reflex and cross(i) > eps:
+                reflex.remove(i)
+        count = nv
+        v = w
+
+    if cross(v) > eps:
+        triangles.append((vertices[prev[v]], vertices[v], vertices[next[v]]))
+
+    # A self intersecting outline isn't covered exactly by its triangles
+    total = 0.0
+    for t in triangles:
+        total += signed_area(t)
+    if fabs(total - area) > 0.0001 * max(area, 1.0):
+        return []
+    return triangles
+
+def convex_decompose(points, max_vertices=8):
+    """ Split a simple polygon into few convex pieces: the polygon is
+        triangulated, then neighbouring pieces are merged across their shared
+        diagonal as long as the result stays convex and has at most
+        max_vertices vertices (Hertel-Mehlhorn).
+    
+        Return: [[(x,y), ...], ...] counter-clockwise convex polygons,
+          or [] if the polygon can't be decomposed
+    """
+    pieces = [list(t) for t in triangulate(points)]
+
+    # Directed edge -> index of the piece it belongs to. A diagonal is
+    # present in both directions, once in each of the two pieces.
+    edges = {}
+    for i in xrange(len(pieces)):
+        piece = pieces[i]
+        for k in xrange(len(piece)):
+            edges[(piece[k - 1], piece[k])] = i
+
+    merged = True
+    while merged:
+        merged = False
+        for i in xrange(len(pieces)):
+            piece = pieces[i]
+            if piece is None:
+                continue
+            for k in xrange(len(piece)):
+                a, b = piece[k - 1], piece[k]
+                j = edges.get((b, a))
+                if j is None or j == i:
+                    continue
+                new_piece = _merge_pieces(piece, pieces[j], a, b, max_vertices)
+                if new_piece is None:
+                    continue
+
+                # Piece j is absorbed into piece i
+                for e in xrange(len(piece)):
+                    edges.pop((piece[e - 1], piece[e]), None)
+                other = pieces[j]
+                for e in xrange(len(other)):
+                    edges.pop((other[e - 1], other[e]), None)
+                for e in xrange(len(new_piece)):
+                    edges[(new_piece[e - 1], new_piece[e])] = i
+                pieces[i] = new_piece
+                pieces[j] = None
+                merged = True
+                break
+
+    return [piece for piece in pieces if piece is not None]
+
+def _merge_pieces(p, q, a, b, max_vertices):
+    # Merge the ccw polygons p (with edge a->b) and q (with edge b->a).
+    # Return the merged polygon, or None if it would not be convex or
+    # would have too many vertices.
+    i = p.index(b)
+    j = q.index(a)
+    if q[j - 1] != b:
+        return None # vertices touching each other, not a real diagonal
+    # p from b around to a, then q from a around to b (without the ends)
+    poly = p[i:] + p[:i]
+    poly += (q[j:] + q[:j])[1:-1]
+
+    # Only the corners at a and b can have become reflex. Collinear corners
+    # are dropped, Box2D doesn't like them.
+    for corner in (a, b):
+        k = poly.index(corner)
+        ax, ay = poly[k - 1]
+        bx, by = corner
+        cx, cy = poly[(k + 1) % len(poly)]
+        c = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+        if c < 0:
+            return None
+        if c == 0:
+            poly.pop(k)
+
+    if len(poly) > max_vertices:
+        return None
+    return poly
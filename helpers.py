@@ -21,8 +21,13 @@
 #                     Helper classes and functions
 #                           By Alex Levenson
 #==================================================================
+import sys
 import math
 
+# The elements package needs Box2D (see physics.py)
+sys.path.append("lib/Box2D-2.0.2b1-py2.5-linux-i686.egg")
+from elements import tools_poly
+
 def distance(pt1, pt2):
     """Distance calculator, pt1 and pt2 are ordred pairs.
     """
@@ -44,17 +49,11 @@ def constructTriangleFromLine(p1, p2):
     return [p2, p3, p4]
 
 def polyArea(vertices):
-    """Returns the area of a polygon.
+    """Returns the signed area of a polygon, > 0 for counter-clockwise ones.
+
+    See elements.tools_poly.signed_area, which does the work.
     """
-    n = len(vertices)
-    A = 0
-    p = n - 1
-    q = 0
-    while q < n:
-        A += vertices[p][0] * vertices[q][1] - vertices[q][0] * vertices[p][1]
-        p = q
-        q += 1
-    return A / 2.0
+    return tools_poly.signed_area(vertices)
 
     
 def insideTriangle(pt, triangle):
@@ -80,74 +79,56 @@ def insideTriangle(pt, triangle):
     bCROSScp = bx * cpy - by * cpx  
     return aCROSSbp >= 0.0 and bCROSScp >= 0.0 and cCROSSap >= 0.0
 
-def polySnip(vertices, u, v, w, n):
-    EPSILON = 0.0000000001
-
-    Ax = vertices[u][0]
-    Ay = vertices[u][1]
-
-    Bx = vertices[v][0]
-    By = vertices[v][1]
-
-    Cx = vertices[w][0]
-    Cy = vertices[w][1]
-
-    if EPSILON > (((Bx-Ax) * (Cy - Ay)) - ((By - Ay) * (Cx - Ax))):
-        return False
-
-    for p in range(0, n):
-        if p == u or p == v or p == w:
-            continue
-        Px = vertices[p][0]
-        Py = vertices[p][1]
-        if insideTriangle((Px, Py), ((Ax, Ay), (Bx, By), (Cx, Cy))):
-            return False
-
-    return True
+def insidePoly(pt, vertices):
+    """Returns true if pt is inside the polygon described by vertices.
 
+    Uses the even-odd rule, so the polygon may be concave.
+    """
+    x, y = pt
+    inside = False
+    j = len(vertices) - 1
+    for i in range(len(vertices)):
+        xi, yi = vertices[i]
+        xj, yj = vertices[j]
+        if (yi > y) != (yj > y) and \
+           x < (xj - xi) * (y - yi) / float(yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
 
 def decomposePoly(vertices):
     """Decomposes a polygon into its triangles.
+
+    The ear clipper lives in elements.tools_poly.triangulate, next to the
+    convex decomposition which is built on top of it. Returns [] if the
+    polygon can't be triangulated (eg. it intersects itself).
     """
-    vertices = list(vertices)
-    n = len(vertices)
-    result = []
-    if(n < 3): return [] # not a poly!
-
-    # Force counter-clockwise polygon
-    if 0 >= polyArea(vertices):
-        vertices.reverse()
-
-    # Remove nv-2 vertices, creating 1 triangle every time
-    nv = n
-    count = 2 * nv # error detection
-    v = nv - 1
-    while nv > 2:
-        count -= 1
-        if 0 >= count:
-            return [] # Error -- probably bad polygon
-
-        # Three consecutive vertices
-        u = v 
-        if nv <= u: u = 0      # previous
-        v = u + 1
-        if nv <= v: v = 0    # new v
-        w = v + 1
-        if nv <= w: w = 0    # next
-
-        if(polySnip(vertices, u, v, w, nv)):
-
-            # Record this triangle
-            result.append((vertices[u], vertices[v], vertices[w]))
-
-            # Remove v from remaining polygon
-            vertices.pop(v)
-            nv -= 1
-            # Reset error detection
-            count = 2 * nv
-    return result
+    return tools_poly.triangulate(vertices)
 
 def cast_tuple_to_int(tuple_input):
     """Cast tuple values to ints to avoid gtk+ and pygame's dislike of floats.
     """
     return [int(i) for i in tuple_input]
+
+
+if __name__ == '__main__':
+    # Benchmark: decompose a wobbly 500 vertex outline like the magic pen
+    # produces it
+    import time
+    outline = []
+    for i in range(500):
+        a = 2 * math.pi * i / 500
+        r = 200 + 60 * math.sin(7 * a) + 20 * math.sin(31 * a)
+        outline.append((int(400 + r * math.cos(a)), int(300 + r * math.sin(a))))
+    start = time.time()
+    triangles = decomposePoly(outline)
+    print "decomposePoly: %i vertices -> %i triangles in %.1f ms" % \
+        (len(outline), len(triangles), (time.time() - start) * 1000)
+    start = time.time()
+    pieces = tools_poly.convex_decompose(outline)
+    print "convex_decompose: %i vertices -> %i convex pieces in %.1f ms" % \
+        (len(outline), len(pieces), (time.time() - start) * 1000)
+    start = time.time()
+    hull = tools_poly.convex_hull(outline)
+    print "convex_hull: %i vertices -> %i hull vertices in %.1f ms" % \
+        (len(outline), len(hull), (time.time() - start) * 1000)
@@ -0,0 +1,171 @@
+"""
+    Physics, a 2D Physics Playground for Kids
+    Copyright (C) 2008  Alex Levenson and Brian Jordan
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+#==================================================================
+#                           Physics.activity
+#                     Input to screen latency
+#==================================================================
+import time
+import pygame
+
+# Stages of an input event's way to the screen:
+#   wait ...... GTK delivered it until the game loop was ready for the
+#               input of the next frame (the frame rate limit and the
+#               rest of the frame before)
+#   backlog ... ready (or delivered, if later) until the game loop took it
+#               from the queue
+#   tool ...... taken from the queue until the tool handled it
+#   frame ..... handled until the frame showing its effect was flipped
+#   total ..... GTK delivered it until the flip
+STAGES = ('wait', 'backlog', 'tool', 'frame', 'total')
+
+# Bucket i counts latencies below 2**i milliseconds, the last one the rest
+BUCKETS = 12
+
+def _bucket(seconds):
+    ms = int(seconds * 1000.0)
+    i = 0
+    while ms and i < BUCKETS - 1:
+        ms >>= 1
+        i += 1
+    return i
+
+class Histogram:
+    """Counts latencies in buckets of powers of two milliseconds"""
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.longest = 0.0
+
+    def add(self, seconds):
+        self.counts[_bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.longest:
+            self.longest = seconds
+
+    def mean(self):
+        if not self.count:
+            return 0.0
+        return self.total / self.count
+
+    def percentile(self, p):
+        """Upper bound of the p-th percentile (0-100) in seconds, limited
+        to the longest latency seen
+        """
+        if not self.count:
+            return 0.0
+        wanted = self.count * p / 100.0
+        seen = 0
+        for i in range(BUCKETS):
+            seen += self.counts[i]
+            if seen >= wanted:
+                break
+        return min((1 << i) / 1000.0, self.longest)
+
+class LatencyMonitor:
+    """Follows input events from GTK to the flip of the frame they changed.
+    eventwrap stamps input events with the time GTK delivered them and
+    the time they left the queue, the game loop reports when it is ready
+    for the next frame's input, when the tool has handled them and when
+    the frame is flipped.
+    """
+    def __init__(self):
+        self.histograms = {}
+        for stage in STAGES:
+            self.histograms[stage] = Histogram()
+        # (delivered, dequeued, handled) of the events of this frame
+        self.pending = []
+        self.ready_at = time.time()
+        self.font = None
+
+    def clear(self):
+        for histogram in self.histograms.values():
+            histogram.clear()
+        self.pending = []
+
+    def ready(self):
+        """Called when the game loop starts taking the input of a frame,
+        ie. after the frame rate limit
+        """
+        self.ready_at = time.time()
+
+    def handled(self, event):
+        """Called after the tool handled an event"""
+        delivered = getattr(event, 'time', None)
+        if delivered is None:
+            # Not an input event from GTK
+            return
+        self.pending.append((delivered, getattr(event, 'dequeued', delivered),
+                             time.time()))
+
+    def flipped(self):
+        """Called after the display was flipped"""
+        if not self.pending:
+            return
+        now = time.time()
+        ready = self.ready_at
+        wait = self.histograms['wait']
+        backlog = self.histograms['backlog']
+        tool = self.histograms['tool']
+        frame = self.histograms['frame']
+        total = self.histograms['total']
+        for delivered, dequeued, handled in self.pending:
+            wait.add(max(ready - delivered, 0.0))
+            backlog.add(max(dequeued - max(ready, delivered), 0.0))
+            tool.add(handled - dequeued)
+            frame.add(now - handled)
+            total.add(now - delivered)
+        self.pending = []
+
+    def discard(self):
+        """Forget the events of a frame which is not drawn"""
+        self.pending = []
+
+    def summary(self):
+        """Return: a dict of stage: (count, mean, median, 95th percentile,
+           longest), latencies in seconds
+        """
+        result = {}
+        for stage in STAGES:
+            histogram = self.histograms[stage]
+            result[stage] = (histogram.count, histogram.mean(),
+                             histogram.percentile(50),
+                             histogram.percentile(95), histogram.longest)
+        return result
+
+    def draw(self, surface, pos=(10, 10)):
+        """Draw a table of the latencies in milliseconds"""
+        if self.font is None:
+            self.font = pygame.font.Font(None, 20)
+        summary = self.summary()
+        lines = ["stage       n    mean   p50   p95   max"]
+        for stage in STAGES:
+            count, mean, median, p95, longest = summary[stage]
+            lines.append("%-7s %6d %6.1f %5.0f %5.0f %5.0f" %
+                         (stage, count, mean * 1000, median * 1000,
+                          p95 * 1000, longest * 1000))
+        x, y = pos
+        for line in lines:
+            text = self.font.render(line, True, (0, 0, 0), (255, 255, 255))
+            surface.blit(text, (x, y))
+            y += text.get_height()
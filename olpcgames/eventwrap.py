@@ -4,13 +4,20 @@ Provides methods which will be substituted into Pygame in order to
 provide the synthetic events that we will feed into the Pygame queue.
 These methods are registered by the "install" method.
 
-This event queue does not support getting events only of a certain type. 
-You need to get all pending events at a time, or filter them yourself. You 
-can, however, block and unblock events of certain types, so that may be 
-useful to you. 
+Events are queued per type, so getting only the events of certain types 
+is cheap and keeps them in the order they were posted.  You can also block 
+and unblock events of certain types.  Control events (pygame.QUIT and the 
+USEREVENTs of the activity, see set_control) are delivered before the 
+other events, so they don't wait behind queued input. 
 
 Set_grab doesn't do anything (you are not allowed to grab events). Sorry.
 
+Consecutive mouse motion events are merged while they wait in the queue: 
+the merged event has the latest pos, the summed rel and a samples list 
+with every position the pointer went through.  Once MAX_QUEUED_EVENTS are 
+waiting, further motion events are dropped, other events never are.  See 
+get_stats() for the counters.
+
 Extensions:
 
     wait( timeout=None ) -- allows you to wait for only a specified period 
@@ -21,7 +28,9 @@ Extensions:
 import pygame
 import gtk
 import Queue
-import thread, threading
+import threading
+import time
+from collections import deque
 import logging
 from olpcgames import util
 
@@ -70,6 +79,84 @@ class Event(object):
         except AttributeError, err:
             pass 
 
+class InputEvent( object ):
+    """Compact event for the frequent input types (motion, buttons, keys)
+    
+    Only the attributes of the event's type are set, as with pygame's 
+    events.  Instances are pooled, get them from motion_event, 
+    button_event and key_event.  An event goes back to the pool once it 
+    is retired, so don't keep a reference to it beyond the next get().
+    
+    time is when GTK delivered the event (the first one, for merged 
+    motion), dequeued when get() took it from the queue.
+    """
+    __slots__ = (
+        'type', 'pos', 'rel', 'buttons', 'samples',
+        'button', 'key', 'unicode', 'mod',
+        'time', 'dequeued',
+    )
+    def _get_dict( self ):
+        result = {}
+        for key in self.__slots__[1:]:
+            try:
+                result[key] = getattr( self, key )
+            except AttributeError, err:
+                pass
+        return result
+    dict = property( _get_dict )
+    def __repr__( self ):
+        return '%s( %s, %s )'%(
+            self.__class__.__name__,
+            self.type,
+            ",".join( ['%s = %r'%item for item in self.dict.items()] ),
+        )
+    def _recycle( self ):
+        """Clear the event and return it to the pool"""
+        for key in self.__slots__:
+            try:
+                delattr( self, key )
+            except AttributeError, err:
+                pass
+        if len( _INPUT_POOL ) < MAX_POOLED_EVENTS:
+            _INPUT_POOL.append( self )
+
+# Retired input events waiting for reuse, appended and popped from 
+# different threads, which is safe for a list
+_INPUT_POOL = []
+MAX_POOLED_EVENTS = 256
+
+def _input_event( type ):
+    try:
+        event = _INPUT_POOL.pop()
+    except IndexError, err:
+        event = InputEvent()
+    event.type = type
+    event.time = time.time()
+    return event
+
+def motion_event( pos, rel, buttons ):
+    """Get a pooled pygame.MOUSEMOTION event"""
+    event = _input_event( pygame.MOUSEMOTION )
+    event.pos = pos
+    event.rel = rel
+    event.buttons = buttons
+    return event
+
+def button_event( type, pos, button ):
+    """Get a pooled pygame.MOUSEBUTTONDOWN/UP event"""
+    event = _input_event( type )
+    event.pos = pos
+    event.button = button
+    return event
+
+def key_event( type, key, unicode, mod ):
+    """Get a pooled pygame.KEYDOWN/UP event"""
+    event = _input_event( type )
+    event.key = key
+    event.unicode = unicode
+    event.mod = mod
+    return event
+
 class CallbackResult( object ):
     def __init__( self, callable, args, named, callContext=None ):
         """Perform callback in Pygame loop with args and named
@@ -100,13 +187,19 @@ class CallbackResult( object ):
 _EVENTS_TO_RETIRE = []
 
 def _releaseEvents( ):
-    """Release/retire previously-processed events"""
+    """Release/retire previously-processed events, recycle input events"""
+    global _EVENTS_TO_RETIRE
     if _EVENTS_TO_RETIRE:
         for event in _EVENTS_TO_RETIRE:
+            if isinstance( event, InputEvent ):
+                event._recycle()
+                continue
             try:
                 event.retire()
             except AttributeError, err:
                 pass
+        # Each event is released once, even if pump() runs again
+        _EVENTS_TO_RETIRE = []
 
 def _processCallbacks( events ):
     """Process any callbacks in events and remove from the stream"""
@@ -147,83 +240,220 @@ def install():
     import sys
     sys.modules["pygame.event"] = eventwrap
 
+# Priority classes of events
+CONTROL = 0
+BULK = 1
+# Requests from the activity (file requests, actions, focus) and quitting
+CONTROL_TYPES = (pygame.QUIT, pygame.USEREVENT)
+# The only events control events overtake: a tool switch or an undo must
+# not come before the button release of a drag posted ahead of it
+OVERTAKEN_TYPES = (pygame.MOUSEMOTION,)
+
 # Event queue:
-class _FilterQueue( Queue.Queue ):
-    """Simple Queue sub-class with a put_left method"""
-    def get_type( self, filterFunction, block=True, timeout=None ):
-        """Get events of a given type
-        
-        Note: can raise Empty *even* when blocking if someone else 
-        pops the event off the queue before we get around to it.
+class _EventStore( object ):
+    """Pending events, kept in one FIFO per event type
+
+    Every event is numbered when it is posted, so events taken from
+    several FIFOs come out in the order they were posted, and getting
+    the events of some types never looks at the events of other types.
+
+    Events of the types in control are delivered ahead of the pointer 
+    motion posted before them, so requests from the activity don't wait 
+    behind a flood of motion, but never ahead of other events.
+
+    mutex also guards the set of blocked events, so posting takes a
+    single lock.  Methods with a leading underscore expect the caller
+    to hold it.
+    """
+    def __init__( self ):
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition( self.mutex )
+        self.queues = {} # event type: deque of (sequence, time posted, event)
+        self.control = set( CONTROL_TYPES )
+        self.overtaken = set( OVERTAKEN_TYPES )
+        self.sequence = 0
+        self.count = 0
+        # Per priority class: events delivered, summed and longest wait
+        self.latency = {
+            CONTROL: [0, 0.0, 0.0],
+            BULK: [0, 0.0, 0.0],
+        }
+    def _put( self, event ):
+        """Append event to the FIFO of its type"""
+        type = getattr( event, 'type', None )
+        queue = self.queues.get( type )
+        if queue is None:
+            queue = self.queues[type] = deque()
+        queue.append( (self.sequence, time.time(), event) )
+        self.sequence += 1
+        self.count += 1
+    def _delivered( self, entries, lane ):
+        """Account for the time entries of the lane spent queued"""
+        if not entries:
+            return
+        now = time.time()
+        latency = self.latency[lane]
+        latency[0] += len( entries )
+        for entry in entries:
+            if isinstance( entry[2], InputEvent ):
+                entry[2].dequeued = now
+            waited = now - entry[1]
+            latency[1] += waited
+            if waited > latency[2]:
+                latency[2] = waited
+    def _merge_motion( self, event ):
+        """Merge a motion event into the last posted event if that is a waiting motion
+
+        returns whether the event was merged
+        """
+        queue = self.queues.get( pygame.MOUSEMOTION )
+        if not queue or queue[-1][0] != self.sequence - 1:
+            return False
+        last = queue[-1][2]
+        if not isinstance( last, (Event, InputEvent) ):
+            return False
+        if getattr( last, 'buttons', None ) != getattr( event, 'buttons', None ):
+            # A press or release in between must keep its own motion
+            return False
+        samples = getattr( last, 'samples', None )
+        if samples is None:
+            samples = last.samples = [ last.pos ]
+        samples.append( event.pos )
+        last.rel = (last.rel[0] + event.rel[0], last.rel[1] + event.rel[1])
+        last.pos = event.pos
+        return True
+    def _first( self ):
+        """The FIFO holding the next event to deliver and its class
+
+        That is the oldest event, or the oldest control event if only 
+        events it overtakes were posted before it.
+        """
+        first = control = None
+        barrier = None # the oldest event control events don't overtake
+        for type, queue in self.queues.iteritems():
+            if not queue:
+                continue
+            sequence = queue[0][0]
+            if first is None or sequence < first[0][0]:
+                first = queue
+            if type in self.control:
+                if control is None or sequence < control[0][0]:
+                    control = queue
+            elif type not in self.overtaken:
+                if barrier is None or sequence < barrier:
+                    barrier = sequence
+        if control is not None and (barrier is None or control[0][0] < barrier):
+            return control, CONTROL
+        return first, BULK
+    def qsize( self ):
+        return self.count
+    def empty( self ):
+        return self.count == 0
+    def get( self, block=True, timeout=None ):
+        """Get the oldest event, raise Queue.Empty if there is none
+
+        block, timeout -- as for Queue.Queue.get
         """
         self.not_empty.acquire()
         try:
-            if not block:
-                if self._empty_type( filterFunction ):
-                    raise Queue.Empty
-            elif timeout is None:
-                while self._empty_type( filterFunction ):
-                    self.not_empty.wait()
-            else:
-                if timeout < 0:
-                    raise ValueError("'timeout' must be a positive number")
-                endtime = _time() + timeout
-                while self._empty_type( filterFunction ):
-                    remaining = endtime - _time()
-                    if remaining <= 0.0:
-                        raise Queue.Empty
-                    self.not_empty.wait(remaining)
-            item = self._get_type( filterFunction )
-            self.not_full.notify()
-            return item
+            if block:
+                if timeout is not None:
+                    endtime = time.time() + timeout
+                while not self.count:
+                    if timeout is None:
+                        self.not_empty.wait()
+                    else:
+                        remaining = endtime - time.time()
+                        if remaining <= 0.0:
+                            break
+                        self.not_empty.wait( remaining )
+            if not self.count:
+                raise Queue.Empty
+            self.count -= 1
+            queue, lane = self._first()
+            entry = queue.popleft()
+            self._delivered( (entry,), lane )
+            return entry[2]
         finally:
             self.not_empty.release()
-    def _empty_type( self, filterFunction ):
-        """Are we empty with respect to filterFunction?"""
-        for element in self.queue:
-            if filterFunction( element ):
-                return False 
-        return True
-    def _get_type( self, filterFunction ):
-        """Get the first instance which matches filterFunction"""
-        for element in self.queue:
-            if filterFunction( element ):
-                self.queue.remove( element )
-                return element 
-        # someone popped the event off the queue before we got to it!
-        raise Queue.Empty
-    def peek_type( self, filterFunction= lambda x: True ):
-        """Peek to see if we have filterFunction-matching element
-        
-        Note: obviously this is *not* thread safe, it's just informative...
+    def get_all( self, types=None ):
+        """Remove and return all events of the given types
+
+        Events come in posting order, except that control events move
+        ahead of the pointer motion posted right before them (see _first).
+
+        types -- sequence of event types, None for all events
         """
+        self.mutex.acquire()
         try:
-            for element in self.queue:
-                if filterFunction( element ):
-                    return element
-            return None
-        except RuntimeError, err:
-            return None # none yet, at least
-    
-g_events = _FilterQueue()
+            if types is None:
+                types = self.queues.keys()
+            found = []
+            for type in types:
+                queue = self.queues.get( type )
+                if queue:
+                    found.append( queue )
+            if not found:
+                return []
+            if len( found ) == 1:
+                entries = list( found[0] )
+            else:
+                entries = []
+                for queue in found:
+                    entries.extend( queue )
+                # The FIFOs are sorted already, so this is a cheap merge
+                entries.sort()
+            for queue in found:
+                queue.clear()
+            self.count -= len( entries )
+
+            result = []
+            control = []
+            bulk = []
+            overtaken = 0 # events at the end of result a control event passes
+            for entry in entries:
+                type = getattr( entry[2], 'type', None )
+                if type in self.control:
+                    result.insert( len( result ) - overtaken, entry[2] )
+                    control.append( entry )
+                else:
+                    result.append( entry[2] )
+                    bulk.append( entry )
+                    if type in self.overtaken:
+                        overtaken += 1
+                    else:
+                        overtaken = 0
+            self._delivered( control, CONTROL )
+            self._delivered( bulk, BULK )
+            return result
+        finally:
+            self.mutex.release()
+    def peek( self, types=None ):
+        """Is there any pending event of the given types?
+
+        types -- sequence of event types, None for all events
+        """
+        if types is None:
+            return self.count > 0
+        for type in types:
+            if self.queues.get( type ):
+                return True
+        return False
+
+g_events = _EventStore()
 
 # Set of blocked events as set by set
 g_blocked = set()
-g_blockedlock = thread.allocate_lock() # should use threading instead
+g_blockedlock = g_events.mutex
 g_blockAll = False
 
-def _typeChecker( types ):
-    """Create check whether an event is in types"""
-    try:
-        if 1 in types:
-            pass
-        def check( element ):
-            return element.type in types
-        return check
-    except TypeError, err:
-        def check( element ):
-            return element.type == types
-        return check
+# Motion events are dropped once this many events are waiting
+MAX_QUEUED_EVENTS = 1024
+g_stats = {
+    'posted': 0,
+    'coalesced': 0,
+    'dropped': 0,
+}
 
 def pump():
     """Handle any window manager and other external events that aren't passed to the user
@@ -242,22 +472,14 @@ def get( types=None):
         queue or a full queue.  Normally you will want to remove all events in your 
         top-level event-loop and propagate them yourself.
     
-        Note: if you use types you lose all event ordering guarantees, events
-        may show up after events which were originally produced before them due to 
-        the re-ordering of the queue on filtering!
+        Events of the given types are returned in the order they were 
+        posted, the other events stay queued.
     """
     pump()
-    eventlist = []
-    try:
-        if types:
-            check = _typeChecker( types )
-            while True:
-                eventlist.append(g_events.get_type( check, block=False))
-        else:
-            while True:
-                eventlist.append(g_events.get(block=False))
-    except Queue.Empty:
-        pass
+    if types:
+        eventlist = g_events.get_all( makeseq( types ) )
+    else:
+        eventlist = g_events.get_all()
     
     pygameEvents = pygame_get()
     if pygameEvents:
@@ -301,24 +523,25 @@ def peek(types=None):
         of integers/longs or an integer/long.
     """
     if types:
-        check = _typeChecker( types )
-        return g_events.peek_type( check ) is not None
+        return g_events.peek( makeseq( types ) )
     return not g_events.empty()
     
 def clear():
     """Clears the entire pending queue of events 
     
-    Rarely used
+    Rarely used.  The discarded events are handed to the caller, so input 
+    events among them are not recycled, while blocked senders are released 
+    right away.  Events from the last get() are retired as usual.
     """
-    try:
-        discarded = []
-        while True:
-            discarded.append( g_events.get(block=False) )
-        discarded = _recordEvents( discarded )
-        _releaseEvents()
-        return discarded
-    except Queue.Empty:
-        pass
+    discarded = _processCallbacks( g_events.get_all() )
+    for event in discarded:
+        if isinstance( event, InputEvent ):
+            continue
+        try:
+            event.retire()
+        except AttributeError, err:
+            pass
+    return discarded
 
 def set_blocked(item):
     """Block item/items from being added to the event queue"""
@@ -351,6 +574,14 @@ def get_blocked(*args, **kwargs):
     finally:
         g_blockedlock.release()
 
+def set_control(item):
+    """Deliver events of the type item/items before all other events"""
+    g_blockedlock.acquire()
+    try:
+        [g_events.control.add(x) for x in makeseq(item)]
+    finally:
+        g_blockedlock.release()
+
 def set_grab(grabbing):
     """This method will not be implemented"""
 
@@ -358,11 +589,59 @@ def get_grab():
     """This method will not be implemented"""
 
 def post(event):
-    """Post a new event to the Queue of events"""
+    """Post a new event to the Queue of events
+    
+    Mouse motion is merged into a motion event that is still waiting, 
+    or dropped if the queue is full.
+    """
+    post_all( (event,) )
+
+def post_all(events):
+    """Post a sequence of events, taking the queue's lock only once"""
+    g_events.not_empty.acquire()
+    try:
+        for event in events:
+            type = getattr(event,'type',None)
+            if type in g_blocked:
+                _discard( event )
+                continue
+            if type == pygame.MOUSEMOTION:
+                if g_events._merge_motion( event ):
+                    g_stats['coalesced'] += 1
+                    _discard( event )
+                    continue
+                if g_events.count >= MAX_QUEUED_EVENTS:
+                    g_stats['dropped'] += 1
+                    _discard( event )
+                    continue
+            g_stats['posted'] += 1
+            g_events._put( event )
+        g_events.not_empty.notifyAll()
+    finally:
+        g_events.not_empty.release()
+
+def _discard( event ):
+    """Recycle an input event which is not queued"""
+    if isinstance( event, InputEvent ):
+        event._recycle()
+
+def get_stats():
+    """Get the counters of the event queue
+    
+    returns a dictionary with the number of events posted, of motion 
+    events merged into a waiting one and of motion events dropped, and 
+    for the control and bulk classes the number of events delivered and 
+    their average and longest time in the queue (in seconds)
+    """
     g_blockedlock.acquire()
     try:
-        if getattr(event,'type',None) not in g_blocked:
-            g_events.put(event, block=False)
+        stats = dict( g_stats )
+        for lane, name in ((CONTROL, 'control'), (BULK, 'bulk')):
+            count, total, longest = g_events.latency[lane]
+            stats[name + '_delivered'] = count
+            stats[name + '_latency'] = count and total / count or 0.0
+            stats[name + '_latency_max'] = longest
+        return stats
     finally:
         g_blockedlock.release()
 
@@ -9,6 +9,10 @@ import logging
 log = logging.getLogger( 'olpcgames.gtkevent' )
 ##log.setLevel( logging.DEBUG )
 
+# Button state tuples of motion events, by the bits of BUTTON1..3_MASK
+_BUTTONS = [(i & 1, (i >> 1) & 1, (i >> 2) & 1) for i in range(8)]
+_BUTTON_SHIFT = 8 # BUTTON1_MASK == 1 << 8
+
 class _MockEvent(object):
     """Used to inject key-repeat events on the gtk side."""
     def __init__(self, keyval):
@@ -51,6 +55,10 @@ class Translator(object):
         pygame.K_RSHIFT: pygame.KMOD_RSHIFT,
     }
     
+    # Keyvals translated in advance: latin-1 and the function keys, 
+    # others are translated when first seen
+    keyval_ranges = ((0x20, 0x100), (0xff00, 0x10000))
+    
     def __init__(self, mainwindow, mouselistener=None):
         """Initialise the Translator with the windows to which to listen"""
         # _inner_evb is Mouselistener
@@ -66,9 +74,10 @@ class Translator(object):
             gtk.gdk.KEY_RELEASE_MASK \
         )
         
+        # No motion hints: every motion comes with its position, saving an X
+        # round trip per event, and eventwrap merges them while they wait
         self._inner_evb.set_events(
             gtk.gdk.POINTER_MOTION_MASK | \
-            gtk.gdk.POINTER_MOTION_HINT_MASK | \
             gtk.gdk.BUTTON_MOTION_MASK | \
             gtk.gdk.BUTTON_PRESS_MASK | \
             gtk.gdk.BUTTON_RELEASE_MASK 
@@ -96,6 +105,7 @@ class Translator(object):
         self.__held_time_left = {}
         self.__held_last_time = {}
         self.__tick_id = None
+        self._build_keycodes()
 
         #print "translator  initialized"
         self._inner_evb.connect( 'expose-event', self.do_expose_event )
@@ -167,37 +177,66 @@ class Translator(object):
         return mod
         
         
-    def _keyevent(self, widget, event, type):
-        key = gtk.gdk.keyval_name(event.keyval)
+    def _build_keycodes(self):
+        """Translate the common keyvals once, see _keycode"""
+        self.__keycodes = {}
+        for first, last in self.keyval_ranges:
+            for keyval in xrange(first, last):
+                self.__keycodes[keyval] = self._translate_key(keyval)
+        self.__view_source = gtk.gdk.keyval_from_name('XF86Start')
+
+    def _translate_key(self, keyval):
+        """Find the pygame key of a GDK keyval the slow way
+        
+        returns (keycode, unicode), None if pygame has no such key 
+        or False if GDK doesn't know the keyval either
+        """
+        key = gtk.gdk.keyval_name(keyval)
         if key is None:
             # No idea what this key is.
-            return False 
+            return False
         
-        keycode = None
-        if key in self.key_trans:
-            keycode = self.key_trans[key]
-        elif hasattr(pygame, 'K_'+key.upper()):
-            keycode = getattr(pygame, 'K_'+key.upper())
-        elif hasattr(pygame, 'K_'+key.lower()):
-            keycode = getattr(pygame, 'K_'+key.lower())
-        elif key == 'XF86Start':
-            # view source request, specially handled...
-            self._mainwindow.view_source()
-        else:
-            print 'Key %s unrecognized'%key
+        keycode = self.key_trans.get(key)
+        if keycode is None:
+            keycode = getattr(pygame, 'K_'+key.upper(), None)
+        if keycode is None:
+            keycode = getattr(pygame, 'K_'+key.lower(), None)
+        if keycode is None:
+            return None
+        ukey = unichr(gtk.gdk.keyval_to_unicode(keyval))
+        if ukey == '\000':
+            ukey = ''
+        return (keycode, ukey)
+
+    def _keycode(self, keyval):
+        """Look up the translation of a keyval, remembering unknown ones too"""
+        try:
+            return self.__keycodes[keyval]
+        except KeyError:
+            result = self.__keycodes[keyval] = self._translate_key(keyval)
+            if result is None:
+                log.info('Key %s unrecognized', gtk.gdk.keyval_name(keyval))
+            return result
+
+    def _keyevent(self, widget, event, type):
+        translation = self._keycode(event.keyval)
+        if translation is False:
+            return False 
+        if translation is None:
+            if event.keyval == self.__view_source:
+                # view source request, specially handled...
+                self._mainwindow.view_source()
+            return True
             
-        if keycode is not None:
-            if type == pygame.KEYDOWN:
-                mod = self._keymods()
-            self.__keystate[keycode] = type == pygame.KEYDOWN
-            if type == pygame.KEYUP:
-                mod = self._keymods()
-            ukey = unichr(gtk.gdk.keyval_to_unicode(event.keyval))
-            if ukey == '\000':
-                ukey = ''
-            evt = eventwrap.Event(type, key=keycode, unicode=ukey, mod=mod)
-            assert evt.key, evt
-            self._post(evt)
+        keycode, ukey = translation
+        if type == pygame.KEYDOWN:
+            mod = self._keymods()
+        self.__keystate[keycode] = type == pygame.KEYDOWN
+        if type == pygame.KEYUP:
+            mod = self._keymods()
+        evt = eventwrap.key_event(type, keycode, ukey, mod)
+        assert evt.key, evt
+        self._post(evt)
         return True
 
     def _get_pressed(self):
@@ -218,9 +257,7 @@ class Translator(object):
         
     def _mouseevent(self, widget, event, type):
 
-        evt = eventwrap.Event(type, 
-                                             button=event.button, 
-                                             pos=(event.x, event.y))
+        evt = eventwrap.button_event(type, (event.x, event.y), event.button)
         self._post(evt)
         return True
         
@@ -239,16 +276,11 @@ class Translator(object):
                 y - self.__mouse_pos[1])
         self.__mouse_pos = (x, y)
         
-        self.__button_state = [
-            state & gtk.gdk.BUTTON1_MASK and 1 or 0,
-            state & gtk.gdk.BUTTON2_MASK and 1 or 0,
-            state & gtk.gdk.BUTTON3_MASK and 1 or 0,
-        ]
+        # Events get a shared tuple, so a later press doesn't change them
+        buttons = _BUTTONS[(state >> _BUTTON_SHIFT) & 7]
+        self.__button_state[:] = buttons
         
-        evt = eventwrap.Event(pygame.MOUSEMOTION,
-                                             pos=self.__mouse_pos,
-                                             rel=rel,
-                                             buttons=self.__button_state)
+        evt = eventwrap.motion_event(self.__mouse_pos, rel, buttons)
         self._post(evt)
         return True
         
@@ -279,11 +311,5 @@ class Translator(object):
         return self.__mouse_pos
             
     def _post(self, evt):
-        try:
-            eventwrap.post(evt)
-        except pygame.error, e:
-            if str(e) == 'Event queue full':
-                print "Event queue full!"
-                pass
-            else:
-                raise e
+        # eventwrap merges or drops motion itself, see eventwrap.get_stats
+        eventwrap.post(evt)
@@ -25,21 +25,67 @@ Code:   git://git.sugarlabs.org/physics/mainline.git
 
 """
 
+import os
 import sys
 import math
+import time
 import pygame
 from pygame.locals import *
 from pygame.color import *
 import olpcgames
 sys.path.append("lib/")
 import pkg_resources
-sys.path.append("lib/Elements-0.13-py2.5.egg")
 sys.path.append("lib/Box2D-2.0.2b1-py2.5-linux-i686.egg")
 import Box2D as box2d
 import elements
 import tools
 from helpers import *
+from latency import LatencyMonitor
 import gtk
+from threading import Thread
+
+# Size of the journal preview
+PREVIEW_SIZE = (300, 225)
+
+class PreviewJob(Thread):
+    """Encodes a preview image as PNG on a worker thread.
+    """
+    def __init__(self, pixels, version, done):
+        Thread.__init__(self)
+        self.pixels = pixels
+        self.version = version
+        self.done = done
+        self.data = None
+
+    def run(self):
+        width, height = PREVIEW_SIZE
+        pixbuf = gtk.gdk.pixbuf_new_from_data(self.pixels,
+                                              gtk.gdk.COLORSPACE_RGB, 0, 8,
+                                              width, height, 3 * width)
+        preview_data = []
+        def save_func(buf, data):
+            data.append(buf)
+
+        pixbuf.save_to_callback(save_func, 'png', user_data=preview_data)
+        self.data = ''.join(preview_data)
+        self.done(self.version, self.data)
+
+# Logs of crashed sessions which were never resumed are removed after a week
+AUTOSAVE_MAX_AGE = 7 * 24 * 3600
+
+def remove_stale_autosaves(directory, keep):
+    """Removes old autosave files (see elements/oplog.py) of other sessions
+    """
+    now = time.time()
+    for filename in os.listdir(directory):
+        if not filename.startswith('autosave-') or filename.startswith(keep + '.'):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            if now - os.path.getmtime(path) > AUTOSAVE_MAX_AGE:
+                os.remove(path)
+        except OSError:
+            pass
 
 class PhysicsGame:
     def __init__(self, screen):
@@ -47,7 +93,12 @@ class PhysicsGame:
         # Get everything set up
         self.clock = pygame.time.Clock()
         self.canvas = olpcgames.ACTIVITY.canvas
+        # The activity moves its timeline slider to timeline_position
+        olpcgames.ACTIVITY.game = self
+        self.timeline_position = 1.0
         self.in_focus = True
+        # Seconds per frame to spend on creating the bodies of a loaded scene
+        self.load_budget = 0.015
         # Create the name --> instance map for components
         self.toolList = {}
         for c in tools.allTools:
@@ -57,10 +108,27 @@ class PhysicsGame:
         self.box2d = box2d
         self.world = elements.Elements(self.screen.get_size())
         self.world.renderer.set_surface(self.screen)
+        # The journal preview, kept until the scene changes
+        self.preview_surface = pygame.Surface(PREVIEW_SIZE, 0, self.screen)
+        self.preview_job = None
+        # Input latency, shown on screen with F9
+        self.latency = LatencyMonitor()
+        self.show_latency = False
 
         # Set up static environment
         self.world.add.ground()
 
+        # Log all edits, so a crash doesn't lose the session
+        activity = olpcgames.ACTIVITY
+        instance = os.path.join(activity.get_activity_root(), 'instance')
+        autosave = 'autosave-%s' % activity.get_id()
+        remove_stale_autosaves(instance, autosave)
+        self.world.set_oplog(os.path.join(instance, autosave))
+        # Undo history of at most 4 MB
+        self.world.set_history(4 << 20)
+        # A checkpoint every second for the last two minutes
+        self.world.set_timeline(120, 30, before_step=self.drive_motors)
+
         # Fake a Sugar cursor for the pyGame canvas area
         self.show_fake_cursor = False
         pygame.mouse.set_cursor((8, 8), (0, 0), (0, 0, 0, 0, 0, 0, 0, 0), (0, 0, 0, 0, 0, 0, 0, 0))
@@ -81,18 +149,26 @@ class PhysicsGame:
         while True:
             for event in pygame.event.get():
                 self.currentTool.handleEvents(event)
+                self.latency.handled(event)
+            # Let the tool process the input of this frame in one go
+            self.currentTool.update()
+            if self.world.oplog is not None:
+                self.world.oplog.commit()
+            # A drag (eg. of the eraser) is undone as a whole
+            if not pygame.mouse.get_pressed()[0]:
+                self.world.history.commit()
+
+            # Continue a scene which is still loading
+            if self.world.loader is not None:
+                self.world.loader.step(self.load_budget)
 
             if self.in_focus:
-                # Drive motors
                 if self.world.run_physics:
-                    for body in self.world.world.GetBodyList():
-                        if type(body.userData) == type({}):
-                            if body.userData.has_key('rollMotor'):
-                                diff = body.userData['rollMotor']['targetVelocity'] - body.GetAngularVelocity()
-                                body.ApplyTorque(body.userData['rollMotor']['strength'] * diff * body.getMassData().I)
+                    self.drive_motors()
 
                 # Update & Draw World
                 self.world.update()
+                self.timeline_position = self.world.timeline.fraction()
                 self.screen.fill((255, 255, 255)) # 255 for white
                 self.world.draw()
 
@@ -103,11 +179,45 @@ class PhysicsGame:
                 if self.show_fake_cursor:
                     self.screen.blit(self.cursor_picture, pygame.mouse.get_pos())
 
+                if self.show_latency:
+                    self.latency.draw(self.screen)
+
                 # Flip Display
                 pygame.display.flip()
+                self.latency.flipped()
+            else:
+                self.latency.discard()
 
             # Stay under 30 FPS to help keep the rest of the platform responsive
             self.clock.tick(30) # Originally 50
+            self.latency.ready()
+
+    def preview(self):
+        """Answers a preview request (see PhysicsActivity.get_preview): a
+        PreviewJob encodes the screen and hands it to the activity, unless
+        one is at it for the current scene already.
+        """
+        job = self.preview_job
+        if job is None or job.version != self.world.version or not job.isAlive():
+            try:
+                pygame.transform.smoothscale(self.screen, PREVIEW_SIZE,
+                                             self.preview_surface)
+            except ValueError:
+                # smoothscale only handles 24 and 32 bit surfaces
+                pygame.transform.scale(self.screen, PREVIEW_SIZE,
+                                       self.preview_surface)
+            job = PreviewJob(pygame.image.tostring(self.preview_surface, "RGB"),
+                             self.world.version,
+                             olpcgames.ACTIVITY.set_preview)
+            job.start()
+            self.preview_job = job
+
+    def drive_motors(self):
+        for body in self.world.world.GetBodyList():
+            if type(body.userData) == type({}):
+                if body.userData.has_key('rollMotor'):
+                    diff = body.userData['rollMotor']['targetVelocity'] - body.GetAngularVelocity()
+                    body.ApplyTorque(body.userData['rollMotor']['strength'] * diff * body.getMassData().I)
 
     def setTool(self, tool):
         self.currentTool.cancel()
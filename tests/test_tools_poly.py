@@ -0,0 +1,170 @@
+"""
+    Physics, a 2D Physics Playground for Kids
+    Copyright (C) 2008  Alex Levenson and Brian Jordan
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+#==================================================================
+#                           Physics.activity
+#     Tests of the convex hull and simplify in elements.tools_poly
+#
+#      Run from the activity directory: python tests/test_tools_poly.py
+#==================================================================
+import os
+import sys
+import imp
+import time
+import math
+import random
+import unittest
+
+# Load tools_poly on its own: the elements package needs Box2D, which is
+# only there on an XO. Its "from locals import *" finds elements/locals.py.
+elements_dir = os.path.join(os.path.dirname(os.path.dirname(
+                                os.path.abspath(__file__))), "elements")
+sys.path.insert(0, elements_dir)
+tools_poly = imp.load_source("tools_poly",
+                             os.path.join(elements_dir, "tools_poly.py"))
+
+def cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+def between(a, b, p):
+    # p on the closed segment a-b, for collinear points
+    return (min(a[0], b[0]) <= p[0] <= max(a[0], b[0]) and
+            min(a[1], b[1]) <= p[1] <= max(a[1], b[1]))
+
+def brute_force_hull(points):
+    """Corners of the convex hull: a-b is a counter-clockwise hull edge
+    if every point is left of it or on the segment itself
+    """
+    points = set(points)
+    corners = set()
+    for a in points:
+        for b in points:
+            if a == b:
+                continue
+            for p in points:
+                c = cross(a, b, p)
+                if c < 0 or (c == 0 and not between(a, b, p)):
+                    break
+            else:
+                corners.add(a)
+                corners.add(b)
+    return corners
+
+class ConvexHullTest(unittest.TestCase):
+    def check_hull(self, points):
+        hull = tools_poly.convex_hull(points)
+        self.assertEqual(set(hull), brute_force_hull(points))
+        self.assertEqual(len(hull), len(set(hull)))
+        if len(hull) < 3:
+            return
+        n = len(hull)
+        for i in range(n):
+            a, b = hull[i], hull[(i + 1) % n]
+            # Strictly convex and counter-clockwise
+            self.assertTrue(cross(a, b, hull[(i + 2) % n]) > 0)
+            # Every input point is inside or on the hull
+            for p in points:
+                self.assertTrue(cross(a, b, p) >= 0)
+
+    def test_random(self):
+        rand = random.Random(4193)
+        # Sizes above 64 use the NumPy prefilter, if NumPy is available
+        for size in (3, 4, 5, 10, 30, 65, 100):
+            for i in range(10):
+                points = [(rand.randint(-50, 50), rand.randint(-50, 50))
+                          for j in range(size)]
+                self.check_hull(points)
+
+    def test_collinear(self):
+        points = [(i, 2 * i) for i in range(10)]
+        self.assertEqual(sorted(tools_poly.convex_hull(points)),
+                         [(0, 0), (9, 18)])
+        # Points in the middle of an edge are not corners
+        square = [(0, 0), (5, 0), (10, 0), (10, 5), (10, 10), (0, 10)]
+        self.assertEqual(sorted(tools_poly.convex_hull(square)),
+                         [(0, 0), (0, 10), (10, 0), (10, 10)])
+
+    def test_duplicates(self):
+        points = [(0, 0), (10, 0), (10, 0), (10, 10), (0, 10), (0, 0), (5, 5)]
+        self.assertEqual(sorted(tools_poly.convex_hull(points)),
+                         [(0, 0), (0, 10), (10, 0), (10, 10)])
+        self.assertEqual(tools_poly.convex_hull([(1, 1)] * 5), [(1, 1)])
+
+    def test_few_points(self):
+        self.assertEqual(tools_poly.convex_hull([]), [])
+        self.assertEqual(tools_poly.convex_hull([(1, 2)]), [(1, 2)])
+        self.assertEqual(sorted(tools_poly.convex_hull([(3, 4), (1, 2)])),
+                         [(1, 2), (3, 4)])
+        self.check_hull([(0, 0), (4, 0), (0, 3)])
+
+    def test_input_not_modified(self):
+        rand = random.Random(33)
+        points = [[rand.randint(0, 20), rand.randint(0, 20)] for i in range(100)]
+        copy = [list(p) for p in points]
+        tools_poly.convex_hull(points)
+        self.assertEqual(points, copy)
+
+def segment_distance(p, a, b):
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    l = dx * dx + dy * dy
+    t = 0.0
+    if l:
+        t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / float(l)))
+    return math.hypot(p[0] - a[0] - t * dx, p[1] - a[1] - t * dy)
+
+class SimplifyTest(unittest.TestCase):
+    def check_simplify(self, points, tolerance):
+        result = tools_poly.simplify(points, tolerance)
+        self.assertEqual(result[0], points[0])
+        self.assertEqual(result[-1], points[-1])
+        # Every dropped point is within tolerance of the result
+        kept = [points.index(p) for p in result]
+        self.assertEqual(kept, sorted(kept))
+        for i, j in zip(kept, kept[1:]):
+            for k in range(i + 1, j):
+                self.assertTrue(segment_distance(points[k], points[i],
+                                                 points[j]) <= tolerance)
+        return result
+
+    def test_noisy_circle(self):
+        rand = random.Random(32)
+        points = []
+        for i in range(1000):
+            a = 2 * math.pi * i / 1000
+            r = 200 + rand.uniform(-3, 3)
+            points.append((400 + r * math.cos(a), 300 + r * math.sin(a)))
+        self.assertTrue(len(self.check_simplify(points, 4.0)) < 200)
+
+    def test_max_vertices(self):
+        points = [(200 * math.cos(a / 50.0), 200 * math.sin(a / 50.0))
+                  for a in range(300)]
+        result = tools_poly.simplify(points, 0, 9)
+        self.assertEqual(len(result), 9)
+        self.assertEqual(result[0], points[0])
+        self.assertEqual(result[-1], points[-1])
+
+    def test_zigzag(self):
+        # The worst case of plain Douglas-Peucker: 4 s for these points
+        points = [(i, (i % 2) * 20) for i in range(3000)]
+        start = time.time()
+        tools_poly.simplify(points, 4.0)
+        self.assertTrue(time.time() - start < 1.0)
+        self.check_simplify(points, 4.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,6 +25,7 @@ import pygame
 import olpcgames
 from pygame.locals import *
 from helpers import *
+from elements.tools_poly import StrokeFilter
 from inspect import getmro
 from gettext import gettext as _
 
@@ -52,16 +53,51 @@ class Tool(object):
                     self.game.in_focus = True
                 elif event.action == "focus_out":
                     self.game.in_focus = False
+                elif event.action in ("undo", "redo"):
+                    # Bodies held by the tool may be gone afterwards
+                    self.cancel()
+                    history = self.game.world.history
+                    if history is not None:
+                        if event.action == "undo":
+                            history.undo()
+                        else:
+                            history.redo()
+                elif event.action == "preview":
+                    self.game.preview()
+                elif event.action == "seek":
+                    timeline = self.game.world.timeline
+                    if timeline is not None:
+                        timeline.seek_fraction(event.position)
                 elif self.game.toolList.has_key(event.action):
                     self.game.setTool(event.action)
             elif hasattr(event, "code"):
                 if event.code == olpcgames.FILE_WRITE_REQUEST:
                     #Saving to journal
                     self.game.world.add.remove_mouseJoint()
-                    self.game.world.json_save(event.filename)
+                    # Capture the scene now, it is packed and written in
+                    # the background (see PhysicsActivity.save)
+                    event.job = self.game.world.binary_save(event.filename,
+                                                            background=True)
+                    if self.game.world.oplog is not None:
+                        # The log can start over from what is being saved
+                        self.game.world.oplog.rebase(event.job)
                 elif event.code == olpcgames.FILE_READ_REQUEST:
-                    #Loading from journal
-                    self.game.world.json_load(event.filename)
+                    #Loading from journal, unless a crashed session left
+                    #edits of this entry in the log
+                    oplog = self.game.world.oplog
+                    if oplog is None or not oplog.recover(event.filename):
+                        # Big scenes fill in over the next frames
+                        self.game.world.load(event.filename,
+                                             budget=self.game.load_budget)
+                    # Bodies held by the tool are gone now
+                    self.cancel()
+        elif event.type == QUIT:
+            # Removes the log's files unless there are unsaved edits
+            if self.game.world.oplog is not None:
+                self.game.world.oplog.close()
+        elif event.type == KEYDOWN and event.key == K_F9:
+            # Show or hide the input latency
+            self.game.show_latency = not self.game.show_latency
         elif event.type == MOUSEBUTTONDOWN and event.button == 1:
             self.game.canvas.grab_focus()
             handled = False
@@ -76,6 +112,10 @@ class Tool(object):
         # Overload to handel events for Tool subclasses
         pass
 
+    def update(self):
+        # Called once per frame after all events have been handled
+        pass
+
     def draw(self):
         # Default drawing method is don't draw anything
         pass
@@ -252,7 +292,7 @@ class PolygonTool(Tool):
     def __init__(self, gameInstance):
         Tool.__init__(self, gameInstance)
         self.vertices = None
-        self.previous_vertices = None
+        self.template = None
         self.safe = False
 
     def handleToolEvent(self, event):
@@ -261,17 +301,10 @@ class PolygonTool(Tool):
                 self.vertices = [cast_tuple_to_int(event.pos)]
                 self.safe = False
             if event.type == MOUSEBUTTONUP and self.vertices is not None and len(self.vertices) == 1 and cast_tuple_to_int(event.pos)[0] == self.vertices[0][0] and cast_tuple_to_int(event.pos)[1] == self.vertices[0][1]:
-                if self.previous_vertices is not None:
-                    last_x_y = self.previous_vertices[-1]
-                    delta_x = last_x_y[0] - cast_tuple_to_int(event.pos)[0]
-                    delta_y = last_x_y[1] - cast_tuple_to_int(event.pos)[1]
-                    self.vertices = [[i[0] - delta_x, i[1] - delta_y]
-                                                for i in self.previous_vertices]
-                    self.safe = True
-                    self.game.world.add.complexPoly(self.vertices, dynamic=True,
-                                                    density=1.0,
-                                                    restitution=0.16,
-                                                    friction=0.5)
+                if self.template is not None:
+                    # Stamp a copy of the previous polygon
+                    self.game.world.add.stamp(self.template,
+                                              cast_tuple_to_int(event.pos))
                 self.vertices = None
             elif (event.type == MOUSEBUTTONUP or event.type == MOUSEBUTTONDOWN):
                 if self.vertices is None or (cast_tuple_to_int(event.pos)[0] == self.vertices[-1][0] and cast_tuple_to_int(event.pos)[1] == self.vertices[-1][1]):
@@ -279,11 +312,14 @@ class PolygonTool(Tool):
                     return
                 if distance(cast_tuple_to_int(event.pos), self.vertices[0]) < 15 and self.safe:
                     self.vertices.append(self.vertices[0]) # Connect polygon
-                    self.game.world.add.complexPoly(self.vertices, dynamic=True,
+                    body, vertices = self.game.world.add.complexPoly(
+                                                    self.vertices, dynamic=True,
                                                     density=1.0,
                                                     restitution=0.16,
                                                     friction=0.5)
-                    self.previous_vertices = self.vertices[:]
+                    if body is not None:
+                        self.template = self.game.world.add.template(
+                                                    body, self.vertices[-1])
                     self.vertices = None
                 elif distance(cast_tuple_to_int(event.pos), self.vertices[0]) < 15:
                     self.vertices = None
@@ -317,49 +353,54 @@ class MagicPenTool(Tool):
 
     def __init__(self, gameInstance):
         Tool.__init__(self, gameInstance)
-        self.vertices = None
-        self.previous_vertices = None
+        self.stroke = None
+        self.template = None
         self.safe = False
 
     def handleToolEvent(self, event):
         if event.type == MOUSEBUTTONDOWN and event.button == 1:
-            self.vertices = [cast_tuple_to_int(event.pos)]
+            # Simplify while drawing, so the stroke never grows large
+            self.stroke = StrokeFilter(cast_tuple_to_int(event.pos))
             self.safe = False
         elif event.type == MOUSEBUTTONUP and event.button == 1:
-            if len(self.vertices) == 1 and self.previous_vertices is not None:
-                last_x_y = self.previous_vertices[-1]
-                delta_x = last_x_y[0] - cast_tuple_to_int(event.pos)[0]
-                delta_y = last_x_y[1] - cast_tuple_to_int(event.pos)[1]
-                self.vertices = [[i[0] - delta_x, i[1] - delta_y]
-                                            for i in self.previous_vertices]
-                self.safe = True
-            if self.vertices and self.safe:
-                self.game.world.add.complexPoly(self.vertices, dynamic=True,
+            if self.stroke is None:
+                return
+            if self.stroke.count == 1 and self.template is not None:
+                # Stamp a copy of the previous drawing
+                self.game.world.add.stamp(self.template,
+                                          cast_tuple_to_int(event.pos))
+            elif self.safe:
+                vertices = self.stroke.points()
+                body, vertices = self.game.world.add.complexPoly(
+                                                vertices, dynamic=True,
                                                 density=1.0,
                                                 restitution=0.16,
-                                                friction=0.5)
-                self.previous_vertices = self.vertices[:]
-            self.vertices = None
-        elif event.type == MOUSEMOTION and self.vertices:
-            self.vertices.append(cast_tuple_to_int(event.pos))
-            if distance(cast_tuple_to_int(event.pos), self.vertices[0]) >= 55 and len(self.vertices) > 3:
+                                                friction=0.5,
+                                                is_convex=self.stroke.is_convex())
+                if body is not None:
+                    self.template = self.game.world.add.template(
+                                                body, vertices[-1])
+            self.stroke = None
+        elif event.type == MOUSEMOTION and self.stroke:
+            # Merged motion events carry every pointer position
+            for pos in getattr(event, 'samples', [event.pos]):
+                self.stroke.add(cast_tuple_to_int(pos))
+            pos = cast_tuple_to_int(event.pos)
+            if distance(pos, self.stroke.vertices[0]) >= 55 and self.stroke.count > 3:
                 self.safe = True
 
     def draw(self):
         # Draw the poly being created
-        if self.vertices:
-            if len(self.vertices) > 1:
-                for i in range(len(self.vertices) - 1):
-                    pygame.draw.line(self.game.screen, (100, 180, 255),
-                                     self.vertices[i], self.vertices[i + 1], 3)
-                pygame.draw.line(self.game.screen, (100, 180, 255),
-                                 self.vertices[-1],
-                                 cast_tuple_to_int(pygame.mouse.get_pos()), 3)
-                pygame.draw.circle(self.game.screen, (100, 180, 255),
-                                   self.vertices[0], 15, 3)
+        if self.stroke and self.stroke.count > 1:
+            vertices = self.stroke.points()
+            vertices.append(cast_tuple_to_int(pygame.mouse.get_pos()))
+            pygame.draw.lines(self.game.screen, (100, 180, 255), False,
+                              vertices, 3)
+            pygame.draw.circle(self.game.screen, (100, 180, 255),
+                               vertices[0], 15, 3)
 
     def cancel(self):
-        self.vertices = None
+        self.stroke = None
 
 
 # The grab tool
@@ -403,10 +444,226 @@ class GrabTool(Tool):
                     x, y = self.game.world.to_world(cast_tuple_to_int(event.pos))
                     x /= self.game.world.ppm
                     y /= self.game.world.ppm
+                    # Log the move (and let it be undone, see Elements.touch)
+                    self.game.world.touch(self._current_body)
                     self._current_body.position = (x, y)
 
     def cancel(self):
         self.game.world.add.remove_mouseJoint()
+        # An undo in the middle of a drag may replace or remove the body
+        self._current_body = None
+
+
+# The selection tool
+class SelectTool(Tool):
+    name = 'Select'
+    icon = 'select'
+    toolTip = _("Select")
+    toolAccelerator = _("<ctrl>l")
+
+    # Maximum number of shapes the broadphase reports for one selection
+    max_shapes = 4096
+    # Offset of cloned bodies from their originals, in pixels
+    clone_offset = 20
+
+    def __init__(self, gameInstance):
+        Tool.__init__(self, gameInstance)
+        self.selection = {}
+        self.vertices = None
+        self.lasso = False
+        self.move_pos = None
+
+    def handleToolEvent(self, event):
+        if event.type == MOUSEBUTTONDOWN and event.button == 1:
+            pos = cast_tuple_to_int(event.pos)
+            if self.selected_at(pos):
+                # Drag the whole selection around
+                self.move_pos = pos
+            else:
+                # Start a rectangle, or a lasso if shift is held
+                keys = pygame.key.get_pressed()
+                self.lasso = keys[K_LSHIFT] or keys[K_RSHIFT]
+                self.vertices = [pos]
+        elif event.type == MOUSEMOTION and event.buttons[0]:
+            pos = cast_tuple_to_int(event.pos)
+            if self.move_pos is not None:
+                self.move(pos[0] - self.move_pos[0], pos[1] - self.move_pos[1])
+                self.move_pos = pos
+            elif self.vertices is not None:
+                if self.lasso:
+                    for sample in getattr(event, 'samples', [event.pos]):
+                        self.vertices.append(cast_tuple_to_int(sample))
+                else:
+                    self.vertices[1:] = [pos]
+        elif event.type == MOUSEBUTTONUP and event.button == 1:
+            if self.vertices is not None:
+                self.select(self.outline(cast_tuple_to_int(event.pos)))
+            self.vertices = None
+            self.move_pos = None
+        elif event.type == KEYDOWN and self.selection:
+            if event.key in (K_DELETE, K_BACKSPACE):
+                self.delete()
+            elif event.key == K_c:
+                self.clone()
+            elif event.key == K_f:
+                self.freeze()
+            elif event.key == K_u:
+                self.unfreeze()
+            elif event.key in (K_PLUS, K_EQUALS, K_KP_PLUS):
+                self.set_density(1.5)
+            elif event.key in (K_MINUS, K_KP_MINUS):
+                self.set_density(1 / 1.5)
+            elif event.key == K_RIGHTBRACKET:
+                self.set_friction(0.1)
+            elif event.key == K_LEFTBRACKET:
+                self.set_friction(-0.1)
+            elif event.key == K_ESCAPE:
+                self.selection = {}
+
+    def outline(self, pos):
+        # The selection polygon in screen coordinates
+        if self.lasso:
+            return self.vertices + [pos]
+        x1, y1 = self.vertices[0]
+        x2, y2 = pos
+        return [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+
+    def selectable(self, body):
+        # Static bodies (like the ground) can only be selected if we froze them
+        if type(body.userData) != type({}):
+            return False
+        return not body.IsStatic() or body.userData.has_key('frozen')
+
+    def selected_at(self, pos):
+        bodylist = self.game.world.get_bodies_at_pos(pos, include_static=True)
+        if bodylist:
+            for body in bodylist:
+                if self.selection.has_key(self.game.world.get_id(body)):
+                    return True
+        return False
+
+    def select(self, outline):
+        """Selects all bodies whose center lies within the outline (screen
+        coordinates), using a single broadphase query for its bounding box.
+        """
+        self.selection = {}
+        if abs(polyArea(outline)) < 9:
+            # Just a click, select the body under the pointer
+            bodylist = self.game.world.get_bodies_at_pos(outline[0],
+                                                         include_static=True)
+            if bodylist and self.selectable(bodylist[0]):
+                self.selection[self.game.world.get_id(bodylist[0])] = bodylist[0]
+            return
+
+        points = [self.game.world.to_meters(p) for p in outline]
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        aabb = self.game.box2d.b2AABB()
+        aabb.lowerBound = (min(xs), min(ys))
+        aabb.upperBound = (max(xs), max(ys))
+        count, shapes = self.game.world.world.Query(aabb, self.max_shapes)
+        if count == 0:
+            return
+
+        for shape in shapes:
+            body = shape.GetBody()
+            key = self.game.world.get_id(body)
+            if self.selection.has_key(key) or not self.selectable(body):
+                continue
+            if insidePoly(body.GetWorldCenter().tuple(), points):
+                self.selection[key] = body
+
+    def move(self, dx, dy):
+        # Screen pixels -> world meters, the y axis points up in the world
+        dx = float(dx) / self.game.world.ppm
+        dy = -float(dy) / self.game.world.ppm
+        for body in self.selection.values():
+            self.game.world.touch(body)
+            x, y = body.position.tuple()
+            body.position = (x + dx, y + dy)
+            if self.game.world.run_physics:
+                body.linearVelocity = (0, 0)
+                body.angularVelocity = 0
+                body.WakeUp()
+
+    def delete(self):
+        # Box2D removes the attached joints along with the bodies
+        for body in self.selection.values():
+            self.game.world.destroy_body(body)
+        self.selection = {}
+
+    def clone(self):
+        """Creates a copy of every selected body (without joints) and selects
+        the copies.
+        """
+        world = self.game.world
+        clones = {}
+        for body in self.selection.values():
+            # The template keeps the mass, so frozen copies are static too
+            anchor = cast_tuple_to_int(world.from_meters(body.position.tuple()))
+            template = world.add.template(body, anchor)
+            pos = (anchor[0] + self.clone_offset, anchor[1] + self.clone_offset)
+            newBody = world.add.stamp(template, pos, body.userData)
+            clones[world.get_id(newBody)] = newBody
+        self.selection = clones
+
+    def make_static(self, body):
+        # A body without mass and inertia is static in Box2D
+        massData = self.game.box2d.b2MassData()
+        massData.mass = 0.0
+        massData.I = 0.0
+        massData.center = body.GetLocalCenter()
+        body.SetMass(massData)
+        body.linearVelocity = (0, 0)
+        body.angularVelocity = 0
+
+    def freeze(self):
+        for body in self.selection.values():
+            if not body.userData.has_key('frozen'):
+                self.game.world.touch(body)
+                body.userData['frozen'] = True
+                self.make_static(body)
+
+    def unfreeze(self):
+        for body in self.selection.values():
+            if body.userData.has_key('frozen'):
+                self.game.world.touch(body)
+                del body.userData['frozen']
+                body.SetMassFromShapes()
+                body.WakeUp()
+
+    def set_density(self, factor):
+        for body in self.selection.values():
+            self.game.world.touch(body)
+            for shape in body.GetShapeList():
+                shape.density = shape.density * factor
+            if not body.userData.has_key('frozen'):
+                body.SetMassFromShapes()
+
+    def set_friction(self, delta):
+        for body in self.selection.values():
+            self.game.world.touch(body)
+            for shape in body.GetShapeList():
+                shape.friction = min(max(shape.friction + delta, 0.0), 1.0)
+
+    def draw(self):
+        # Mark the selected bodies
+        for body in self.selection.values():
+            x, y = body.GetWorldCenter().tuple()
+            pos = self.game.world.to_screen((x * self.game.world.ppm,
+                                             y * self.game.world.ppm))
+            pygame.draw.circle(self.game.screen, (100, 180, 255),
+                               cast_tuple_to_int(pos), 6, 2)
+        # Draw the rectangle or lasso being created
+        if self.vertices:
+            outline = self.outline(cast_tuple_to_int(pygame.mouse.get_pos()))
+            pygame.draw.lines(self.game.screen, (100, 180, 255), True,
+                              outline, 2)
+
+    def cancel(self):
+        self.selection = {}
+        self.vertices = None
+        self.move_pos = None
 
 
 # The joint tool
@@ -433,7 +690,9 @@ class JointTool(Tool):
                 self.jb2pos = cast_tuple_to_int(event.pos)
                 self.jb2 = self.game.world.get_bodies_at_pos(cast_tuple_to_int(event.pos))
                 # If we have two distinct bodies, add a distance joint!
-                if self.jb1 and self.jb2 and str(self.jb1) != str(self.jb2):
+                if self.jb1 and self.jb2 and \
+                   self.game.world.get_id(self.jb1[0]) != \
+                   self.game.world.get_id(self.jb2[0]):
                     self.game.world.add.joint(self.jb1[0], self.jb2[0],
                                               self.jb1pos, self.jb2pos)
                 #add joint to ground body
@@ -518,6 +777,7 @@ class RollTool(Tool):
                 self.jb1 = self.game.world.get_bodies_at_pos(self.jb1pos)
                 if self.jb1:
                     if type(self.jb1[0].userData) == type({}):
+                        self.game.world.touch(self.jb1[0])
                         self.jb1[0].userData['rollMotor'] = {}
                         self.jb1[0].userData['rollMotor']['targetVelocity'] = -10
                         self.jb1[0].userData['rollMotor']['strength'] = 40
@@ -534,29 +794,91 @@ class DestroyTool(Tool):
     toolTip = _("Erase")
     toolAccelerator = _("<ctrl>e")
 
+    # Half width of the swept eraser stroke, in pixels
+    radius = 5
+    # Maximum number of shapes a ray reports per swept segment
+    max_shapes = 64
+
     def __init__(self, gameInstance):
         Tool.__init__(self, gameInstance)
         self.vertices = None
+        self.samples = []
+        self.last_pos = None
 
     def handleToolEvent(self, event):
-        if pygame.mouse.get_pressed()[0]:
+        if pygame.mouse.get_pressed()[0] and hasattr(event, 'pos'):
             if not self.vertices: self.vertices = []
-            self.vertices.append(cast_tuple_to_int(event.pos))
-            if len(self.vertices) > 10:
-                self.vertices.pop(0)
-
-            tokill = self.game.world.get_bodies_at_pos(cast_tuple_to_int(event.pos))
-
-            if tokill:
-                jointnode = tokill[0].GetJointList()
-                if jointnode:
-                    joint = jointnode.joint
-                    self.game.world.world.DestroyJoint(joint)
-                else:
-                    self.game.world.world.DestroyBody(tokill[0])
+            # Only record the samples, the erasing is done once per frame
+            for pos in getattr(event, 'samples', [event.pos]):
+                pos = cast_tuple_to_int(pos)
+                self.vertices.append(pos)
+                self.samples.append(pos)
+            del self.vertices[:-10]
         elif event.type == MOUSEBUTTONUP and event.button == 1:
+            self.update()
             self.cancel()
 
+    def update(self):
+        # Sweep every segment between the pointer samples of this frame
+        if not self.samples:
+            return
+        if self.last_pos is not None:
+            points = [self.last_pos] + self.samples
+        else:
+            points = self.samples
+        self.last_pos = self.samples[-1]
+        self.samples = []
+
+        found = {}
+        if len(points) == 1:
+            self.sweep(points[0], points[0], found)
+        for i in range(len(points) - 1):
+            self.sweep(points[i], points[i + 1], found)
+        if found:
+            self.destroy(found.values())
+
+    def sweep(self, pt1, pt2, found):
+        """Adds all non static bodies within radius of the segment pt1 -> pt2
+        (screen coordinates) to the found dictionary.
+        """
+        if pt1 == pt2:
+            bodies = self.game.world.get_bodies_at_pos(pt1) or []
+        else:
+            # The capsule is approximated by its center line and both borders
+            length = distance(pt1, pt2)
+            nx = -(pt2[1] - pt1[1]) / length * self.radius
+            ny = (pt2[0] - pt1[0]) / length * self.radius
+            rays = []
+            for ox, oy in ((0, 0), (nx, ny), (-nx, -ny)):
+                rays.append(((pt1[0] + ox, pt1[1] + oy),
+                             (pt2[0] + ox, pt2[1] + oy)))
+            results = self.game.world.raycast_batch(rays, include_static=False,
+                                                    solid=True,
+                                                    maxCount=self.max_shapes)
+            bodies = []
+            for hits in results:
+                bodies.extend([body for body, point, normal in hits])
+        for body in bodies:
+            found[self.game.world.get_id(body)] = body
+
+    def destroy(self, bodies):
+        # Bodies that are held by joints lose their joints first,
+        # all others are removed from the world
+        joints = {}
+        lonely = []
+        for body in bodies:
+            jointnode = body.GetJointList()
+            if not jointnode:
+                lonely.append(body)
+            while jointnode:
+                joint = jointnode.joint
+                joints[self.game.world.get_id(joint)] = joint
+                jointnode = jointnode.next
+        for joint in joints.values():
+            self.game.world.destroy_joint(joint)
+        for body in lonely:
+            self.game.world.destroy_body(body)
+
     def draw(self):
         # Draw the trail
         if self.vertices:
@@ -566,6 +888,8 @@ class DestroyTool(Tool):
 
     def cancel(self):
         self.vertices = None
+        self.samples = []
+        self.last_pos = None
 
 
 def getAllTools():
@@ -575,6 +899,7 @@ def getAllTools():
             BoxTool,
             PolygonTool,
             GrabTool,
+            SelectTool,
             MotorTool,
             PinTool,
             JointTool,